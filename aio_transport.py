@@ -0,0 +1,73 @@
+"""
+aiohttp transport for the OpenAI Responses API
+"""
+import os
+from typing import Any, Optional
+
+import aiohttp
+import orjson
+from openai.types.responses import Response
+
+RESPONSES_URL = "https://api.openai.com/v1/responses"
+
+
+class ResponsesTransportError(Exception):
+    """Non-2xx reply from the Responses API on the aiohttp path"""
+
+    def __init__(self, status: int, message: str, retry_after: Optional[str] = None):
+        super().__init__(f"Responses API error {status}: {message}")
+        self.status = status
+        self.retry_after = retry_after
+
+
+class ResponsesAioTransport:
+    """
+    Calls POST /v1/responses directly over one shared aiohttp session.
+    The OpenAI client's httpx AsyncClient loses throughput as concurrency grows; this
+    path keeps a single keep-alive connector and returns the same Response model.
+    """
+
+    def __init__(self, api_key: Optional[str] = None, limit: int = 100, keepalive_timeout: float = 30.0):
+        self.api_key = api_key or os.getenv("OPENAI_API_KEY")
+        self.limit = limit
+        self.keepalive_timeout = keepalive_timeout
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        # Created lazily: a ClientSession must be built inside the running event loop
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit=self.limit, keepalive_timeout=self.keepalive_timeout)
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                headers={
+                    "Authorization": f"Bearer {self.api_key}",
+                    "Content-Type": "application/json",
+                },
+                timeout=aiohttp.ClientTimeout(total=60.0, connect=5.0),
+            )
+        return self._session
+
+    async def create_response(self, **request: Any) -> Response:
+        """Equivalent of client.responses.create(**request)"""
+        # Encode the body with orjson and send the bytes as-is; aiohttp's json= would
+        # fall back to the stdlib encoder
+        payload = orjson.dumps(request)
+        async with self._get_session().post(RESPONSES_URL, data=payload) as http_response:
+            raw = await http_response.read()
+            if http_response.status >= 400:
+                # Gateways answer 502/503 with HTML, so the error body may not be JSON
+                try:
+                    body = orjson.loads(raw)
+                except orjson.JSONDecodeError:
+                    body = raw[:200].decode(errors="replace")
+                error = body.get("error") if isinstance(body, dict) else None
+                message = error.get("message", str(error)) if isinstance(error, dict) else str(body)
+                raise ResponsesTransportError(
+                    http_response.status, message, http_response.headers.get("retry-after")
+                )
+            return Response.model_validate(orjson.loads(raw))
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
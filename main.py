@@ -1,127 +1,469 @@
 import openai
+import ahocorasick
+import aiohttp
+import argparse
+import ast
+import asyncio
+import httpx
+import inspect
 import json
+import operator
+import orjson
 import os
-from typing import List, Dict, Any
+import queue
+import re
+import ssl
+import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import List, Dict, Any, Callable, Deque, Optional, Tuple
 from datetime import datetime
+from functools import lru_cache, wraps
+
+from openai import APIConnectionError, APIStatusError, APITimeoutError, RateLimitError
+from openai.types.responses import Response
+from tenacity import retry, retry_if_exception, stop_after_attempt, wait_exponential_jitter
+
+from aio_transport import ResponsesAioTransport, ResponsesTransportError
+from response_cache import CacheBackend, MemoryCache, SemanticCache, SQLiteCache, make_cache_key
+
+def _dumps(obj: Any) -> str:
+    """Serialize to a JSON string with orjson (C implementation, several times faster than json)"""
+    try:
+        return orjson.dumps(obj).decode()
+    except orjson.JSONEncodeError:
+        # orjson rejects integers wider than 64 bits (e.g. calculator results like
+        # 2**100); the stdlib encoder writes them as exact JSON numbers
+        return json.dumps(obj, separators=(",", ":"), ensure_ascii=False)
+
+
+_loads = orjson.loads
+
+# Building an SSL context loads the CA bundle from disk, so do it once per process.
+# The context is safe to share everywhere; an httpx client is bound to the event
+# loop it first runs on, so anything needing its own client should build it with
+# create_http_client() instead of constructing a fresh context.
+_SHARED_SSL_CTX = ssl.create_default_context()
+_http_limits = httpx.Limits(max_keepalive_connections=20, max_connections=100, keepalive_expiry=30.0)
+
+
+def create_http_client() -> httpx.AsyncClient:
+    """Pooled keep-alive HTTP transport so repeated API calls reuse warm TLS connections"""
+    return httpx.AsyncClient(
+        verify=_SHARED_SSL_CTX,
+        limits=_http_limits,
+        http2=True,
+        timeout=httpx.Timeout(60.0, connect=5.0),
+    )
 
-# Initialize OpenAI client
-client = openai.OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
 
-class ChainOfThoughtAgent:
+_http_client = create_http_client()
+
+# Initialize OpenAI client (async so independent queries can overlap their network I/O).
+# Shared by every ChainOfThoughtAgent; agents never construct their own client.
+client = openai.AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"), http_client=_http_client)
+# Same client without the SDK's retries, for the calls wrapped in api_retry: nested
+# retries would multiply its attempts and back off while holding a _request_semaphore
+# slot. Everything else (embeddings, batches, files) keeps the SDK's default retries.
+_api_retry_client = client.with_options(max_retries=0)
+
+async def warm_up_connection():
     """
-    Chain of Thought Agent using OpenAI's Responses API.
-    This pattern encourages the model to reason step-by-step, showing its thinking process
-    before arriving at a final answer. It breaks down complex reasoning into explicit,
-    sequential steps that are visible to the user.
-    The Responses API is stateful and handles conversation management automatically.
+    Complete the TCP/TLS (and HTTP/2) handshake with the API before the first real
+    request, so concurrent queries multiplex over an open connection instead of each
+    paying for, or racing to open, a cold one. Failures are left for the real requests.
     """
+    try:
+        await client.models.list()
+    except Exception:
+        pass
 
-    def __init__(self, model: str = "gpt-4o"):
-        self.model = model
-        self.memory: List[Dict[str, Any]] = []
-        self.reasoning_steps: List[Dict[str, Any]] = []  # Store the reasoning chain
-        self.conversation_history: List[Dict[str, str]] = []
-        self.response_id = None  # Track previous response for conversation continuity
 
-    def get_tools_config(self) -> List[Dict]:
-        """Define custom tools for the agent"""
-        return [
-            {
-                "type": "function",
-                "name": "calculator",
-                "description": "Performs basic arithmetic operations. Use this for any mathematical calculations.",
-                "parameters": {
-                    "type": "object",
-                    "properties": {
-                        "expression": {
-                            "type": "string",
-                            "description": "Mathematical expression to evaluate, e.g., '2 + 2' or '10 * 5'"
-                        }
-                    },
-                    "required": ["expression"]
+# Upper bound on in-flight Responses API calls across all agents, to stay under the
+# account's rate limits when many queries run concurrently
+MAX_CONCURRENT_REQUESTS = int(os.getenv("OPENAI_MAX_CONCURRENT_REQUESTS", "50"))
+_request_semaphore = asyncio.Semaphore(MAX_CONCURRENT_REQUESTS)
+
+
+class RequestRateLimiter:
+    """
+    Spaces out request starts evenly so that at most max_per_minute begin in any
+    minute. Unlike the semaphore, which bounds requests in flight, this keeps fast
+    responses from letting a burst of new requests through and tripping the RPM limit.
+    """
+
+    def __init__(self, max_per_minute: int):
+        self.interval = 60.0 / max_per_minute
+        self._next_start = 0.0
+
+    async def wait(self):
+        # Single-threaded event loop: reserving the slot before sleeping needs no lock
+        now = asyncio.get_running_loop().time()
+        start = max(now, self._next_start)
+        self._next_start = start + self.interval
+        if start > now:
+            await asyncio.sleep(start - now)
+
+
+# Optional requests-per-minute ceiling for Responses API calls (0 disables it)
+MAX_REQUESTS_PER_MINUTE = int(os.getenv("OPENAI_MAX_REQUESTS_PER_MINUTE", "0"))
+_rate_limiter = RequestRateLimiter(MAX_REQUESTS_PER_MINUTE) if MAX_REQUESTS_PER_MINUTE > 0 else None
+
+# For high-concurrency runs, set USE_AIOHTTP=1 to bypass the SDK's httpx layer
+USE_AIOHTTP = os.getenv("USE_AIOHTTP", "").lower() in ("1", "true", "yes")
+aio_transport = ResponsesAioTransport() if USE_AIOHTTP else None
+
+
+def _is_retryable(error: BaseException) -> bool:
+    """Rate limits, dropped connections, timeouts and server errors are worth retrying"""
+    if isinstance(error, (RateLimitError, APIConnectionError, APITimeoutError)):
+        return True
+    if isinstance(error, APIStatusError):
+        return error.status_code >= 500
+    if isinstance(error, ResponsesTransportError):
+        return error.status == 429 or error.status >= 500
+    # aiohttp transport: dropped or refused connections and request timeouts
+    return isinstance(error, (aiohttp.ClientError, asyncio.TimeoutError))
+
+
+def _retry_after_seconds(error: Optional[BaseException]) -> Optional[float]:
+    """Delay requested by the server's Retry-After header, if it sent a numeric one"""
+    if isinstance(error, APIStatusError):
+        value = error.response.headers.get("retry-after")
+    elif isinstance(error, ResponsesTransportError):
+        value = error.retry_after
+    else:
+        return None
+    try:
+        return max(float(value), 0.0) if value is not None else None
+    except ValueError:
+        return None
+
+
+_backoff = wait_exponential_jitter(initial=1, max=30)
+
+
+def _wait_for_retry(retry_state) -> float:
+    # Honor the server's Retry-After when present; otherwise back off exponentially with jitter
+    retry_after = _retry_after_seconds(retry_state.outcome.exception())
+    return retry_after if retry_after is not None else _backoff(retry_state)
+
+
+# Shared retry policy for Responses API calls. The semaphore is taken inside each
+# attempt, so a request sleeping between retries does not hold a concurrency slot.
+api_retry = retry(
+    retry=retry_if_exception(_is_retryable),
+    wait=_wait_for_retry,
+    stop=stop_after_attempt(6),
+    reraise=True,
+)
+
+
+@api_retry
+async def create_response(**request: Any) -> Response:
+    """Create a response through the configured transport, bounded by the concurrency cap"""
+    if _rate_limiter is not None:
+        await _rate_limiter.wait()
+    async with _request_semaphore:
+        if aio_transport is not None:
+            return await aio_transport.create_response(**request)
+        return await _api_retry_client.responses.create(**request)
+
+
+# Exact-match cache of Responses API results, keyed on everything sent in the request.
+# Requests leave temperature unset, so identical requests are safe to serve from cache.
+# Set COT_RESPONSE_CACHE_PATH to a SQLite file to keep the cache across runs.
+RESPONSE_CACHE_TTL = 3600.0
+RESPONSE_CACHE_PATH = os.getenv("COT_RESPONSE_CACHE_PATH")
+response_cache: CacheBackend = (
+    SQLiteCache(
+        RESPONSE_CACHE_PATH,
+        encode=lambda response: response.model_dump_json().encode(),
+        decode=Response.model_validate_json,
+        default_ttl=RESPONSE_CACHE_TTL
+    )
+    if RESPONSE_CACHE_PATH
+    else MemoryCache(default_ttl=RESPONSE_CACHE_TTL)
+)
+
+# Second-tier cache: near-duplicate queries ("What is Python?" / "Tell me about Python")
+# reuse a previous answer when their embeddings are close enough.
+EMBEDDING_MODEL = "text-embedding-3-small"
+semantic_cache = SemanticCache(threshold=0.92)
+
+# Queries whose answer depends on when they are asked never use the semantic cache
+_TIME_SENSITIVE_RE = re.compile(
+    r"\b(today|tonight|tomorrow|yesterday|now|current|currently|latest|date|this (week|month|year))\b",
+    re.IGNORECASE
+)
+# Neither do queries with numbers: embeddings barely separate "3 apples" from "5 apples"
+_DIGIT_RE = re.compile(r"\d")
+
+# Shared worker threads for tool execution, so independent tool calls run in parallel
+_TOOL_EXECUTOR = ThreadPoolExecutor(max_workers=8, thread_name_prefix="cot-tool")
+
+# Most recent reasoning steps kept in memory per agent
+MAX_TRACE_STEPS = 1024
+
+# Optional JSONL file receiving every reasoning step (buffered, appended across runs)
+TRACE_FILE = os.getenv("COT_TRACE_FILE")
+_trace_file = open(TRACE_FILE, "ab", buffering=1 << 16) if TRACE_FILE else None
+
+# Separator line framing each section of the console trace
+_BANNER = "=" * 70
+
+# Maximum number of times tool results are sent back to the model for one query
+MAX_TOOL_ROUNDS = 5
+
+# Upper bound on problems marshaled into one request by run_batch(); output latency
+# grows with the size of the combined answer, so keep batches small.
+BATCH_SIZE = 8
+
+# Batch API jobs stop changing once they reach one of these states
+BATCH_TERMINAL_STATUSES = {"completed", "failed", "expired", "cancelled"}
+# Small batches often finish within minutes, so start polling quickly and back off
+BATCH_FIRST_POLL = 5.0
+
+# Tool definitions and system instructions never change, so build them once at import
+# and hand out the same objects on every request instead of rebuilding the literals
+_TOOLS_CONFIG: List[Dict] = [
+    {
+        "type": "function",
+        "name": "calculator",
+        "description": "Performs basic arithmetic operations. Use this for any mathematical calculations.",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "expression": {
+                    "type": "string",
+                    "description": "Mathematical expression to evaluate, e.g., '2 + 2' or '10 * 5'"
                 }
             },
-            {
-                "type": "function",
-                "name": "search_knowledge",
-                "description": "Searches a knowledge base for information about various topics",
-                "parameters": {
-                    "type": "object",
-                    "properties": {
-                        "query": {
-                            "type": "string",
-                            "description": "The search query"
-                        }
-                    },
-                    "required": ["query"]
+            "required": ["expression"]
+        }
+    },
+    {
+        "type": "function",
+        "name": "search_knowledge",
+        "description": "Searches a knowledge base for information about various topics",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "query": {
+                    "type": "string",
+                    "description": "The search query"
                 }
             },
-            {
-                "type": "function",
-                "name": "get_current_date",
-                "description": "Returns the current date and time",
-                "parameters": {
-                    "type": "object",
-                    "properties": {}
-                }
-            }
-        ]
-
-    def execute_tool(self, tool_name: str, arguments: Dict[str, Any]) -> str:
-        """Execute a tool and return the result as a JSON string"""
+            "required": ["query"]
+        }
+    },
+    {
+        "type": "function",
+        "name": "get_current_date",
+        "description": "Returns the current date and time",
+        "parameters": {
+            "type": "object",
+            "properties": {}
+        }
+    }
+]
+
+# Every request starts with the same instructions and tools. Sending them byte-identical
+# under one prompt_cache_key routes requests to the same cache, so OpenAI's automatic
+# prompt caching can reuse the prefix instead of re-processing it on every call.
+# The model name is appended per agent; override the base with OPENAI_PROMPT_CACHE_KEY.
+PROMPT_CACHE_KEY = os.getenv("OPENAI_PROMPT_CACHE_KEY", "chain-of-thought")
+
+# Short queries with none of these hints (numbers, arithmetic, dates, knowledge-base
+# topics, lookups) are sent without the tool schema: the model answers them directly,
+# and leaving the schema out saves its input tokens on every such request.
+_TOOL_FREE_MAX_LENGTH = 64
+_TOOL_HINT_RE = re.compile(
+    r"[0-9+*/^%=-]|\b(calculate|compute|math|sum|total|how (many|much)|date|day|time|year|"
+    r"today|now|when|search|look up|find|python|javascript|ai|openai)\b",
+    re.IGNORECASE
+)
+
+# Pre-serialized form of the tools, used for cache-key hashing
+_TOOLS_CONFIG_JSON = orjson.dumps(_TOOLS_CONFIG, option=orjson.OPT_SORT_KEYS).decode()
+
+# Simulated knowledge base
+_KNOWLEDGE_BASE = {
+    "python": "Python is a high-level programming language created by Guido van Rossum, first released in 1991. Known for its readability and versatility.",
+    "ai": "Artificial Intelligence (AI) involves creating systems that can perform tasks requiring human intelligence, such as learning, reasoning, and problem-solving.",
+    "openai": "OpenAI is an AI research company founded in 2015 that created GPT models, ChatGPT, and various AI tools.",
+    "javascript": "JavaScript is a programming language commonly used for web development, created in 1995 by Brendan Eich.",
+}
+
+# Aho-Corasick automaton over the topic keys: lookup cost is linear in the query
+# length no matter how many topics the knowledge base holds. Each key maps to
+# (priority, key, serialized tool result), so a hit needs no JSON encoding.
+_KNOWLEDGE_AUTOMATON = ahocorasick.Automaton()
+for _priority, (_key, _value) in enumerate(_KNOWLEDGE_BASE.items()):
+    _KNOWLEDGE_AUTOMATON.add_word(_key, (_priority, _key, _dumps({
+        "found": True,
+        "topic": _key,
+        "info": _value
+    })))
+_KNOWLEDGE_AUTOMATON.make_automaton()
+_KNOWLEDGE_NOT_FOUND = _dumps({
+    "found": False,
+    "message": "No relevant information found in knowledge base"
+})
+
+
+def _is_whole_word(text: str, start: int, end: int) -> bool:
+    """True if text[start:end] is not part of a longer word (so "ai" doesn't match "explain")"""
+    return (start == 0 or not text[start - 1].isalnum()) and (end == len(text) or not text[end].isalnum())
+
+
+# Fixed text wrapped around every user query; only the query itself varies per request
+_PROMPT_PREFIX = "Let's solve this problem step by step: "
+_PROMPT_SUFFIX = """
 
-        if tool_name == "calculator":
-            try:
-                # Safe evaluation
-                result = eval(arguments["expression"], {"__builtins__": {}}, {})
-                return json.dumps({
-                    "success": True,
-                    "result": result,
-                    "expression": arguments["expression"]
-                })
-            except Exception as e:
-                return json.dumps({
-                    "success": False,
-                    "error": str(e)
-                })
-
-        elif tool_name == "search_knowledge":
-            # Simulated knowledge base
-            knowledge_base = {
-                "python": "Python is a high-level programming language created by Guido van Rossum, first released in 1991. Known for its readability and versatility.",
-                "ai": "Artificial Intelligence (AI) involves creating systems that can perform tasks requiring human intelligence, such as learning, reasoning, and problem-solving.",
-                "openai": "OpenAI is an AI research company founded in 2015 that created GPT models, ChatGPT, and various AI tools.",
-                "javascript": "JavaScript is a programming language commonly used for web development, created in 1995 by Brendan Eich.",
-            }
-
-            query = arguments["query"].lower()
-            for key, value in knowledge_base.items():
-                if key in query:
-                    return json.dumps({
-                        "found": True,
-                        "topic": key,
-                        "info": value
-                    })
-
-            return json.dumps({
-                "found": False,
-                "message": "No relevant information found in knowledge base"
-            })
-
-        elif tool_name == "get_current_date":
-            current = datetime.now()
-            return json.dumps({
-                "date": current.strftime('%Y-%m-%d'),
-                "time": current.strftime('%H:%M:%S'),
-                "full_datetime": current.strftime('%Y-%m-%d %H:%M:%S'),
-                "year": current.year
-            })
+Think through this carefully, showing your reasoning at each step. Use the available tools when you need to calculate, search for information, or get the current date."""
+# Suffix for requests sent without the tool schema, which mustn't point at tools
+_PROMPT_SUFFIX_NO_TOOLS = """
+
+Think through this carefully, showing your reasoning at each step."""
+
+# Arithmetic the calculator tool accepts; anything else in an expression is rejected
+_BINARY_OPERATORS = {
+    ast.Add: operator.add,
+    ast.Sub: operator.sub,
+    ast.Mult: operator.mul,
+    ast.Div: operator.truediv,
+    ast.FloorDiv: operator.floordiv,
+    ast.Mod: operator.mod,
+    ast.Pow: operator.pow,
+}
+_UNARY_OPERATORS = {
+    ast.USub: operator.neg,
+    ast.UAdd: operator.pos,
+}
+_MAX_EXPONENT = 1000
+# Largest integer power result allowed, in bits (about 3000 decimal digits). Checking
+# only the exponent isn't enough: ((9**999)**999)**999 has small exponents throughout
+_MAX_POWER_BITS = 10_000
+
+
+@lru_cache(maxsize=1024)
+def _parse_expression(expression: str) -> ast.expr:
+    """Parse a calculator expression once; repeated expressions reuse the cached tree"""
+    return ast.parse(expression.strip(), mode="eval").body
+
+
+def _evaluate_node(node: ast.expr):
+    """Evaluate a whitelisted arithmetic AST (numbers, + - * / // % **, unary +/-)"""
+    if isinstance(node, ast.Constant) and type(node.value) in (int, float):
+        return node.value
+    if isinstance(node, ast.BinOp) and type(node.op) in _BINARY_OPERATORS:
+        left = _evaluate_node(node.left)
+        right = _evaluate_node(node.right)
+        if isinstance(node.op, ast.Pow):
+            if abs(right) > _MAX_EXPONENT:
+                raise ValueError(f"Exponent too large: {right}")
+            # Estimate the result size before computing it
+            if isinstance(left, int) and isinstance(right, int) and left.bit_length() * right > _MAX_POWER_BITS:
+                raise ValueError("Result too large")
+        return _BINARY_OPERATORS[type(node.op)](left, right)
+    if isinstance(node, ast.UnaryOp) and type(node.op) in _UNARY_OPERATORS:
+        return _UNARY_OPERATORS[type(node.op)](_evaluate_node(node.operand))
+    raise ValueError(f"Unsupported expression element: {ast.dump(node)}")
+
+
+@lru_cache(maxsize=1024)
+def _calculate(expression: str) -> str:
+    try:
+        result = _evaluate_node(_parse_expression(expression))
+        return _dumps({
+            "success": True,
+            "result": result,
+            "expression": expression
+        })
+    except Exception as e:
+        return _dumps({
+            "success": False,
+            "error": str(e)
+        })
+
+
+@lru_cache(maxsize=1024)
+def _search_knowledge(query: str) -> str:
+    # One automaton pass finds every topic in the query; when several match,
+    # the topic listed first in the knowledge base wins
+    query = query.lower()
+    matches = [
+        entry for end, entry in _KNOWLEDGE_AUTOMATON.iter(query)
+        if _is_whole_word(query, end - len(entry[1]) + 1, end + 1)
+    ]
+    if matches:
+        return min(matches)[2]
+    return _KNOWLEDGE_NOT_FOUND
+
+
+def _tool_calculator(arguments: Dict[str, Any]) -> str:
+    try:
+        return _calculate(arguments["expression"])
+    except Exception as e:  # Missing or non-string expression
+        return _dumps({
+            "success": False,
+            "error": str(e)
+        })
+
+
+def _tool_search_knowledge(arguments: Dict[str, Any]) -> str:
+    return _search_knowledge(arguments["query"])
+
+
+@lru_cache(maxsize=4)
+def _date_payload(epoch_second: int) -> str:
+    current = datetime.fromtimestamp(epoch_second)
+    # Format once and split rather than running strftime three times
+    full_datetime = current.strftime('%Y-%m-%d %H:%M:%S')
+    date, time_of_day = full_datetime.split(' ')
+    return _dumps({
+        "date": date,
+        "time": time_of_day,
+        "full_datetime": full_datetime,
+        "year": current.year
+    })
+
+
+def _tool_get_current_date(arguments: Dict[str, Any]) -> str:
+    # The payload only has second resolution, so calls within the same second share it
+    return _date_payload(int(time.time()))
+
+
+# Tool name -> handler taking the parsed arguments and returning a JSON string.
+# Calculator and knowledge lookups are deterministic, so their results are memoized.
+_TOOL_HANDLERS: Dict[str, Callable[[Dict[str, Any]], str]] = {
+    "calculator": _tool_calculator,
+    "search_knowledge": _tool_search_knowledge,
+    "get_current_date": _tool_get_current_date,
+}
+_TOOL_NOT_FOUND = _dumps({"error": "Tool not found"})
+# Tools whose result depends on when they run
+_TIME_DEPENDENT_TOOLS = frozenset({"get_current_date"})
+
+
+def _is_replayable(tool_calls: List[Dict[str, Any]]) -> bool:
+    """
+    Whether an answer may be served again from the semantic cache. A cache hit executes
+    nothing, so answers are only replayable if every tool they used is one of the pure
+    backend tools above; tools added by subclasses (such as the webapp's UI tools) act
+    on the outside world and must run again, and a replayed date would be stale.
+    """
+    return all(
+        call["tool"] in _TOOL_HANDLERS and call["tool"] not in _TIME_DEPENDENT_TOOLS
+        for call in tool_calls
+    )
 
-        return json.dumps({"error": "Tool not found"})
 
-    def get_system_instructions(self) -> str:
-        """System instructions that implement the Chain of Thought pattern"""
-        return """You are a helpful AI agent that uses Chain of Thought reasoning to solve problems.
+_SYSTEM_INSTRUCTIONS = """You are a helpful AI agent that uses Chain of Thought reasoning to solve problems.
 
 When given a problem or question, you should:
 
@@ -150,70 +492,435 @@ Therefore, the final answer is..."
 
 Be clear, logical, and thorough in your reasoning. Show your work!"""
 
-    def process_with_chain_of_thought(self, user_query: str) -> Dict[str, Any]:
+
+# Tool calls record their timings from worker threads
+_TIMINGS_LOCK = threading.Lock()
+
+
+def _record_timing(state: "AgentState", label: str, start_ns: int):
+    elapsed_ms = (time.perf_counter_ns() - start_ns) / 1e6
+    with _TIMINGS_LOCK:
+        totals = state.timings.setdefault(label, [0, 0.0, 0.0])
+        totals[0] += 1
+        totals[1] += elapsed_ms
+        totals[2] = max(totals[2], elapsed_ms)
+
+
+def timed(label: str):
+    """
+    Decorator for agent methods (sync or async) that adds the wall time of every call
+    to the agent's per-phase timings, so the trace shows where a query's time went:
+    API round trips, tool execution or embedding lookups.
+    """
+    def decorator(method):
+        if inspect.iscoroutinefunction(method):
+            @wraps(method)
+            async def async_wrapper(self, *args, **kwargs):
+                start_ns = time.perf_counter_ns()
+                try:
+                    return await method(self, *args, **kwargs)
+                finally:
+                    _record_timing(self.state, label, start_ns)
+            return async_wrapper
+
+        @wraps(method)
+        def wrapper(self, *args, **kwargs):
+            start_ns = time.perf_counter_ns()
+            try:
+                return method(self, *args, **kwargs)
+            finally:
+                _record_timing(self.state, label, start_ns)
+        return wrapper
+    return decorator
+
+
+@dataclass(slots=True)
+class AgentState:
+    """
+    Mutable per-conversation state of an agent. Everything else an agent uses (client,
+    tools, instructions) is shared module-level data, so recycling an agent only means
+    clearing this.
+    """
+    # Bounded so long-running agents don't grow without limit; the oldest entries
+    # drop off first (set COT_TRACE_FILE to keep the full trace on disk)
+    memory: Deque[Dict[str, Any]] = field(default_factory=lambda: deque(maxlen=MAX_TRACE_STEPS))
+    reasoning_steps: Deque[Dict[str, Any]] = field(default_factory=lambda: deque(maxlen=MAX_TRACE_STEPS))
+    conversation_history: List[Dict[str, str]] = field(default_factory=list)
+    response_id: Optional[str] = None
+    trace: List[str] = field(default_factory=list)  # Buffered console output
+    # Per-phase wall time: label -> [calls, total ms, slowest ms] (see timed)
+    timings: Dict[str, List[float]] = field(default_factory=dict)
+
+    def reset(self):
+        """Clear the state in place so its containers can be reused"""
+        self.memory.clear()
+        self.reasoning_steps.clear()
+        self.conversation_history.clear()
+        self.response_id = None
+        self.trace.clear()
+        self.timings.clear()
+
+
+class ChainOfThoughtAgent:
+    """
+    Chain of Thought Agent using OpenAI's Responses API.
+    This pattern encourages the model to reason step-by-step, showing its thinking process
+    before arriving at a final answer. It breaks down complex reasoning into explicit,
+    sequential steps that are visible to the user.
+    The Responses API is stateful and handles conversation management automatically.
+    """
+
+    def __init__(self, model: str = "gpt-4o", verbose: bool = True):
+        self.model = model
+        self.verbose = verbose  # When False, no trace output is formatted or buffered
+        self.state = AgentState()
+
+    # Conversation state lives in self.state; these keep the attribute API unchanged
+
+    @property
+    def memory(self) -> Deque[Dict[str, Any]]:
+        return self.state.memory
+
+    @memory.setter
+    def memory(self, value):
+        self.state.memory = value
+
+    @property
+    def reasoning_steps(self) -> Deque[Dict[str, Any]]:
+        """Store the reasoning chain"""
+        return self.state.reasoning_steps
+
+    @reasoning_steps.setter
+    def reasoning_steps(self, value):
+        self.state.reasoning_steps = value
+
+    @property
+    def conversation_history(self) -> List[Dict[str, str]]:
+        return self.state.conversation_history
+
+    @conversation_history.setter
+    def conversation_history(self, value):
+        self.state.conversation_history = value
+
+    @property
+    def response_id(self) -> Optional[str]:
+        """Track previous response for conversation continuity"""
+        return self.state.response_id
+
+    @response_id.setter
+    def response_id(self, value: Optional[str]):
+        self.state.response_id = value
+
+    def get_tools_config(self) -> List[Dict]:
+        """Define custom tools for the agent"""
+        return _TOOLS_CONFIG
+
+    @timed("tool")
+    def execute_tool(self, tool_name: str, arguments: Dict[str, Any]) -> str:
+        """Execute a tool and return the result as a JSON string"""
+
+        handler = _TOOL_HANDLERS.get(tool_name)
+        if handler is None:
+            return _TOOL_NOT_FOUND
+        return handler(arguments)
+
+    def record_steps(self, steps: List[Dict[str, Any]]):
+        """Add steps to the in-memory trace and append them to the trace file, if enabled"""
+        self.reasoning_steps.extend(steps)
+        if _trace_file is not None:
+            _trace_file.write(b"".join(orjson.dumps(step) + b"\n" for step in steps))
+
+    def _log(self, message: str, *args: Any):
         """
-        Process the query using Chain of Thought reasoning.
-        The agent will think step-by-step and use tools as needed.
+        Buffer a line of console output (see flush_trace). With args, message is a
+        %-format string that is only formatted when the agent is verbose.
         """
-        print(f"\n🧠 APPLYING CHAIN OF THOUGHT REASONING...")
+        if self.verbose:
+            self.state.trace.append(message % args if args else message)
+
+    def flush_trace(self):
+        """
+        Write all buffered output with a single write, so concurrent agents don't
+        interleave their lines and each step doesn't cost a separate stdout write
+        """
+        trace = self.state.trace
+        if trace:
+            trace.append("")
+            sys.stdout.write("\n".join(trace))
+            sys.stdout.flush()
+            trace.clear()
+
+    @timed("embedding")
+    async def embed_query(self, text: str) -> Optional[List[float]]:
+        """Embed a query for the semantic cache; returns None if embedding fails"""
+        try:
+            response = await client.embeddings.create(model=EMBEDDING_MODEL, input=text)
+            return response.data[0].embedding
+        except Exception as e:
+            self._log("  ⚠️  Semantic cache unavailable: %s", e)
+            return None
 
-        prompt = f"""Let's solve this problem step by step: {user_query}
+    def get_system_instructions(self) -> str:
+        """System instructions that implement the Chain of Thought pattern"""
+        return _SYSTEM_INSTRUCTIONS
+
+    def build_request(self, user_query: str, previous_response_id: Optional[str] = None) -> Dict[str, Any]:
+        """Responses API request body for a query (shared by live calls and the Batch API)"""
+        tools = self.get_tools_config()
+        # Only a fresh query over the built-in tools may go without them: a follow-up turn
+        # ("double that") can need any tool, and the hints don't know a subclass's tools
+        tool_free = (
+            previous_response_id is None
+            and tools is _TOOLS_CONFIG
+            and len(user_query) < _TOOL_FREE_MAX_LENGTH
+            and not _TOOL_HINT_RE.search(user_query)
+        )
+        request = {
+            "model": self.model,
+            "input": _PROMPT_PREFIX + user_query + (_PROMPT_SUFFIX_NO_TOOLS if tool_free else _PROMPT_SUFFIX),
+            "instructions": self.get_system_instructions(),
+            # Tool rounds and follow-up turns continue from this response server-side
+            "store": True,
+            "prompt_cache_key": f"{PROMPT_CACHE_KEY}-{self.model}"
+        }
+        if not tool_free:
+            request["tools"] = tools
+        if previous_response_id is not None:
+            request["previous_response_id"] = previous_response_id
+        return request
+
+    def process_output(
+        self,
+        output: List[Any],
+        tool_results: Optional[Dict[str, str]] = None,
+        step_offset: int = 0
+    ) -> Dict[str, Any]:
+        """
+        Execute the tool calls in a response's output and collect its reasoning text.
+        Tool calls already executed while streaming are looked up in tool_results by call_id.
+        Returns the reasoning, the tool calls made, the trace steps they produced and the
+        function_call_output items to send back to the model.
+        """
+        tool_results = tool_results or {}
+        text_parts = []
+        tool_calls_made = []
+        steps = []
+        function_outputs = []
+        step_number = step_offset
+
+        # Process the response - may include multiple tool calls and reasoning
+        for item in output:
+            if item.type == "function_call":
+                step_number += 1
+                tool_name = item.name
+                try:
+                    tool_args = _loads(item.arguments)
+                except orjson.JSONDecodeError:
+                    tool_args = item.arguments  # Recorded as sent; _run_tool reports the error
+
+                self._log("\n  📍 Step %d: Using tool '%s'", step_number, tool_name)
+                # The raw arguments string is already JSON, so log it as-is
+                self._log("     Arguments: %s", item.arguments)
+
+                tool_result = tool_results.get(item.call_id)
+                if tool_result is None:
+                    tool_result = self._run_tool(tool_name, item.arguments)
+                self._log("     Result: %s", tool_result)
+
+                tool_calls_made.append({
+                    "step": step_number,
+                    "tool": tool_name,
+                    "arguments": tool_args,
+                    "result": tool_result
+                })
 
-Think through this carefully, showing your reasoning at each step. Use the available tools when you need to calculate, search for information, or get the current date."""
+                steps.append({
+                    "type": "tool_call",
+                    "step": step_number,
+                    "tool": tool_name,
+                    "arguments": tool_args,
+                    "result": tool_result
+                })
+
+                function_outputs.append({
+                    "type": "function_call_output",
+                    "call_id": item.call_id,
+                    "output": tool_result
+                })
+
+            elif item.type == "message":
+                for content_item in item.content:
+                    if hasattr(content_item, 'text'):
+                        text_parts.append(content_item.text)
+
+        reasoning_output = "".join(text_parts)
+
+        # Store the reasoning text as well
+        if reasoning_output:
+            steps.append({
+                "type": "reasoning",
+                "content": reasoning_output
+            })
 
+        return {
+            "reasoning": reasoning_output,
+            "tool_calls": tool_calls_made,
+            "reasoning_steps": steps,
+            "function_outputs": function_outputs
+        }
+
+    async def stream_request(self, request: Dict[str, Any]) -> Tuple[Response, Dict[str, str]]:
+        """
+        Stream a response, running each tool call as soon as its arguments finish
+        streaming instead of waiting for the whole response.
+        Returns the final response and the tool results keyed by call_id.
+        """
+        if aio_transport is not None:
+            # The aiohttp transport has no streaming support; tools run afterwards
+            response = await self._create_response(request)
+            return response, await self.execute_tool_calls(response.output)
+
+        response, pending = await self._stream_and_dispatch_tools(request)
+        results = await asyncio.gather(*pending.values())
+        return response, dict(zip(pending.keys(), results))
+
+    # The "api" phase covers only the API call; waiting on tool results counts as "tool"
+
+    @timed("api")
+    async def _create_response(self, request: Dict[str, Any]) -> Response:
+        return await create_response(**request)
+
+    @timed("api")
+    @api_retry
+    async def _stream_and_dispatch_tools(self, request: Dict[str, Any]) -> Tuple[Response, Dict[str, asyncio.Future]]:
+        loop = asyncio.get_running_loop()
+        pending: Dict[str, asyncio.Future] = {}
+
+        if _rate_limiter is not None:
+            await _rate_limiter.wait()
+        async with _request_semaphore:
+            async with _api_retry_client.responses.stream(**request) as stream:
+                async for event in stream:
+                    if event.type == "response.output_item.done" and event.item.type == "function_call":
+                        item = event.item
+                        pending[item.call_id] = loop.run_in_executor(
+                            _TOOL_EXECUTOR, self._run_tool, item.name, item.arguments
+                        )
+                response = await stream.get_final_response()
+
+        return response, pending
+
+    async def execute_tool_calls(self, output: List[Any]) -> Dict[str, str]:
+        """
+        Run every function call in a response's output concurrently on the tool thread
+        pool; calls within one response are independent, so the slowest tool bounds the
+        wait instead of the sum of all of them. Returns results keyed by call_id.
+        """
+        loop = asyncio.get_running_loop()
+        calls = [item for item in output if item.type == "function_call"]
+        results = await asyncio.gather(*(
+            loop.run_in_executor(_TOOL_EXECUTOR, self._run_tool, item.name, item.arguments)
+            for item in calls
+        ))
+        return {item.call_id: result for item, result in zip(calls, results)}
+
+    def _run_tool(self, tool_name: str, raw_arguments: str) -> str:
+        """
+        Parse a function call's arguments and execute it on a worker thread. A failing
+        tool becomes an error result for the model instead of failing the other calls
+        gathered alongside it.
+        """
         try:
-            response = client.responses.create(
-                model=self.model,
-                input=prompt,
-                instructions=self.get_system_instructions(),
-                tools=self.get_tools_config()
-            )
+            return self.execute_tool(tool_name, _loads(raw_arguments))
+        except Exception as e:
+            return _dumps({"error": f"Tool '{tool_name}' failed: {e}"})
+
+    async def process_with_chain_of_thought(self, user_query: str, store_conversation: bool = False) -> Dict[str, Any]:
+        """
+        Process the query using Chain of Thought reasoning.
+        The agent will think step-by-step and use tools as needed; tool results are
+        fed back to the model until it produces an answer without further tool calls.
 
-            reasoning_output = ""
-            tool_calls_made = []
-            step_number = 0
-
-            # Process the response - may include multiple tool calls and reasoning
-            for item in response.output:
-                if item.type == "function_call":
-                    step_number += 1
-                    tool_name = item.name
-                    tool_args = json.loads(item.arguments)
-
-                    print(f"\n  📍 Step {step_number}: Using tool '{tool_name}'")
-                    print(f"     Arguments: {json.dumps(tool_args, indent=4)}")
-
-                    tool_result = self.execute_tool(tool_name, tool_args)
-                    print(f"     Result: {tool_result}")
-
-                    tool_calls_made.append({
-                        "step": step_number,
-                        "tool": tool_name,
-                        "arguments": tool_args,
-                        "result": tool_result
-                    })
-
-                    self.reasoning_steps.append({
-                        "type": "tool_call",
-                        "step": step_number,
-                        "tool": tool_name,
-                        "arguments": tool_args,
-                        "result": tool_result
-                    })
-
-                elif item.type == "message":
-                    for content_item in item.content:
-                        if hasattr(content_item, 'text'):
-                            reasoning_output += content_item.text
-
-            # Store the reasoning text as well
-            if reasoning_output:
-                self.reasoning_steps.append({
-                    "type": "reasoning",
-                    "content": reasoning_output
+        With store_conversation, the query continues the previous turn through
+        previous_response_id, so only the new user turn is sent and the server reuses
+        the context it already holds instead of re-reading the whole history.
+        """
+        self._log("\n🧠 APPLYING CHAIN OF THOUGHT REASONING...")
+
+        try:
+            request = self.build_request(user_query, self.response_id if store_conversation else None)
+            if request.get("tools") is _TOOLS_CONFIG:
+                cache_key = make_cache_key(**{**request, "tools": _TOOLS_CONFIG_JSON})
+            else:
+                cache_key = make_cache_key(**request)
+            query_embedding = None
+            tool_results: Dict[str, str] = {}
+
+            response = response_cache.get(cache_key)
+            if response is not None:
+                self._log("  ⚡ Using cached response")
+                tool_results = await self.execute_tool_calls(response.output)
+            else:
+                # Only fresh conversations use the semantic tier: a follow-up turn depends
+                # on server-side state, so a similar-looking query may need a different answer.
+                # A cached answer to a time-dependent or numeric question would be wrong.
+                if (
+                    self.response_id is None
+                    and not _TIME_SENSITIVE_RE.search(user_query)
+                    and not _DIGIT_RE.search(user_query)
+                ):
+                    # Look up before sending anything: a hit must not have opened (and
+                    # been billed for) a request it throws away
+                    query_embedding = await self.embed_query(user_query)
+                    cached = semantic_cache.lookup(query_embedding) if query_embedding else None
+                    if cached is not None and _is_replayable(cached["tool_calls"]):
+                        self._log("  ⚡ Using semantically cached answer")
+                        self.record_steps(cached["reasoning_steps"])
+                        if store_conversation:
+                            # Continue from the conversation that produced the answer
+                            self.response_id = cached["response_id"]
+                        return {
+                            "reasoning": cached["reasoning"],
+                            "tool_calls": cached["tool_calls"],
+                            "steps": len(self.reasoning_steps)
+                        }
+                response, tool_results = await self.stream_request(request)
+                response_cache.set(cache_key, response, ttl=RESPONSE_CACHE_TTL)
+
+            processed = self.process_output(response.output, tool_results)
+            reasoning_parts = [processed["reasoning"]]
+            tool_calls_made = processed["tool_calls"]
+            steps = processed["reasoning_steps"]
+
+            # Hand tool results back to the model on the same server-side conversation
+            rounds = 0
+            while processed["function_outputs"] and rounds < MAX_TOOL_ROUNDS:
+                rounds += 1
+                response, tool_results = await self.stream_request({
+                    **request,
+                    "previous_response_id": response.id,
+                    "input": processed["function_outputs"]
+                })
+                processed = self.process_output(response.output, tool_results, step_offset=len(tool_calls_made))
+                reasoning_parts.append(processed["reasoning"])
+                tool_calls_made.extend(processed["tool_calls"])
+                steps.extend(processed["reasoning_steps"])
+
+            reasoning_output = "".join(reasoning_parts)
+
+            self.record_steps(steps)
+            if store_conversation:
+                self.response_id = response.id
+
+            if query_embedding and _is_replayable(tool_calls_made):
+                semantic_cache.add(query_embedding, {
+                    "reasoning": reasoning_output,
+                    "tool_calls": tool_calls_made,
+                    "reasoning_steps": steps,
+                    "response_id": response.id
                 })
 
-            print(f"\n✅ Chain of Thought reasoning completed with {len(tool_calls_made)} tool calls")
+            self._log("\n✅ Chain of Thought reasoning completed with %d tool calls", len(tool_calls_made))
 
             return {
                 "reasoning": reasoning_output,
@@ -222,104 +929,302 @@ Think through this carefully, showing your reasoning at each step. Use the avail
             }
 
         except Exception as e:
-            print(f"❌ Error in Chain of Thought reasoning: {e}")
+            self._log("❌ Error in Chain of Thought reasoning: %s", e)
             return {
                 "reasoning": f"Error occurred: {e}",
                 "tool_calls": [],
                 "error": str(e)
             }
 
-    def run(self, user_query: str, store_conversation: bool = False) -> Dict[str, Any]:
+    async def run(self, user_query: str, store_conversation: bool = False) -> Dict[str, Any]:
         """
         Main Chain of Thought agent loop using Responses API.
 
         Args:
             user_query: The user's question or request
-            store_conversation: If True, OpenAI stores conversation state server-side
+            store_conversation: If True, follow-up queries continue this conversation from the
+                state OpenAI stores server-side (via previous_response_id)
         """
-        print(f"\n{'='*70}")
-        print(f"USER QUERY: {user_query}")
-        print(f"{'='*70}\n")
+        self._log("\n%s\nUSER QUERY: %s\n%s\n", _BANNER, user_query, _BANNER)
 
         try:
             # Process the query with Chain of Thought reasoning
-            result = self.process_with_chain_of_thought(user_query)
+            result = await self.process_with_chain_of_thought(user_query, store_conversation)
 
             if "error" in result:
                 return {
                     "answer": result.get("reasoning", "Error occurred"),
-                    "reasoning_steps": self.reasoning_steps,
+                    "reasoning_steps": list(self.reasoning_steps),
                     "tool_calls": result.get("tool_calls", []),
                     "error": result["error"]
                 }
 
-            print(f"\n{'='*70}")
-            print("✅ CHAIN OF THOUGHT REASONING COMPLETED")
-            print(f"{'='*70}\n")
+            self._log("\n%s\n✅ CHAIN OF THOUGHT REASONING COMPLETED\n%s\n", _BANNER, _BANNER)
 
             return {
                 "answer": result["reasoning"],
-                "reasoning_steps": self.reasoning_steps,
+                "reasoning_steps": list(self.reasoning_steps),
                 "tool_calls": result["tool_calls"],
                 "num_steps": result["steps"]
             }
 
         except Exception as e:
-            print(f"\n❌ Error in Chain of Thought reasoning: {str(e)}")
+            self._log("\n❌ Error in Chain of Thought reasoning: %s", e)
             return {
                 "answer": f"Error occurred: {str(e)}",
-                "reasoning_steps": self.reasoning_steps,
+                "reasoning_steps": list(self.reasoning_steps),
                 "tool_calls": [],
                 "error": str(e)
             }
 
+        finally:
+            self.flush_trace()
+
+    @classmethod
+    async def run_many(
+        cls,
+        queries: List[str],
+        model: str = "gpt-4o",
+        pool: Optional["AgentPool"] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Run independent queries concurrently, one agent per query, on the shared client
+        and connection pool. Each query's tool rounds stay sequential; wall time is
+        bounded by the slowest query. Agents come from (and go back to) pool if given.
+        """
+        pool = pool or AgentPool(lambda: cls(model=model))
+        agents = [pool.acquire() for _ in queries]
+        try:
+            return await asyncio.gather(*(agent.run(query) for agent, query in zip(agents, queries)))
+        finally:
+            for agent in agents:
+                pool.release(agent)
+
+    async def run_batch(self, queries: List[str]) -> List[Dict[str, Any]]:
+        """
+        Answer several independent problems with one Responses API call per BATCH_SIZE
+        problems, so the instructions are sent (and billed) once per batch instead of
+        once per problem.
+
+        Tools are not offered in batched mode: a tool call would need its own round trip
+        per problem, which defeats the purpose. Use run() for tool-dependent queries.
+        """
+        batches = [queries[i:i + BATCH_SIZE] for i in range(0, len(queries), BATCH_SIZE)]
+        batch_results = await asyncio.gather(*(self._run_marshaled(batch) for batch in batches))
+        return [result for batch in batch_results for result in batch]
+
+    @timed("api")
+    async def _run_marshaled(self, queries: List[str]) -> List[Dict[str, Any]]:
+        """Send one batch of problems as a single prompt and split the JSON answer back out"""
+        problems = "\n\n".join(f"### Problem {i}\n{query}" for i, query in enumerate(queries, 1))
+        prompt = f"""Solve each of the following independent problems step by step.
+
+{problems}
+
+Return a JSON object of the form {{"answers": [{{"problem": <number>, "reasoning": "<step-by-step reasoning and final answer>"}}]}} with exactly one entry per problem."""
+
+        try:
+            response = await create_response(
+                model=self.model,
+                input=prompt,
+                instructions=self.get_system_instructions(),
+                text={"format": {"type": "json_object"}}
+            )
+            answers = _loads(response.output_text).get("answers", [])
+            by_problem = {answer.get("problem"): answer.get("reasoning", "") for answer in answers}
+        except Exception as e:
+            self._log("❌ Error in batched Chain of Thought reasoning: %s", e)
+            self.flush_trace()
+            return [{
+                "answer": f"Error occurred: {e}",
+                "reasoning_steps": [],
+                "tool_calls": [],
+                "error": str(e)
+            } for _ in queries]
+
+        results = []
+        for i in range(1, len(queries) + 1):
+            reasoning = by_problem.get(i)
+            if reasoning is None:
+                results.append({
+                    "answer": "Error occurred: no answer returned for this problem",
+                    "reasoning_steps": [],
+                    "tool_calls": [],
+                    "error": f"Missing answer for problem {i}"
+                })
+                continue
+
+            steps = [{"type": "reasoning", "content": reasoning}]
+            results.append({
+                "answer": reasoning,
+                "reasoning_steps": steps,
+                "tool_calls": [],
+                "num_steps": len(steps)
+            })
+        return results
+
+    async def run_with_batch_api(self, queries: List[str], poll_interval: float = 30.0) -> List[Dict[str, Any]]:
+        """
+        Submit queries through OpenAI's Batch API, which costs about half as much as live
+        calls but may take up to 24h. Meant for non-interactive runs such as the demos.
+
+        Only the first turn of each query is batched: tool calls in the batched responses
+        are executed locally once the batch completes, but their results are not sent
+        back to the model. Status polls start at BATCH_FIRST_POLL seconds and back off
+        exponentially up to poll_interval.
+        """
+        lines = [
+            _dumps({
+                "custom_id": f"q{i}",
+                "method": "POST",
+                "url": "/v1/responses",
+                "body": self.build_request(query)
+            })
+            for i, query in enumerate(queries)
+        ]
+
+        try:
+            batch_file = await client.files.create(
+                file=("chain_of_thought_batch.jsonl", "\n".join(lines).encode("utf-8")),
+                purpose="batch"
+            )
+            batch = await client.batches.create(
+                input_file_id=batch_file.id,
+                endpoint="/v1/responses",
+                completion_window="24h"
+            )
+            self._log("\n📦 Submitted batch %s with %d requests", batch.id, len(queries))
+            self.flush_trace()
+
+            delay = min(BATCH_FIRST_POLL, poll_interval)
+            while batch.status not in BATCH_TERMINAL_STATUSES:
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, poll_interval)
+                batch = await client.batches.retrieve(batch.id)
+                self._log("   Batch %s status: %s", batch.id, batch.status)
+                self.flush_trace()
+
+            if batch.status != "completed" or not batch.output_file_id:
+                raise RuntimeError(f"Batch {batch.id} finished with status '{batch.status}'")
+
+            output_file = await client.files.content(batch.output_file_id)
+            records = {}
+            for line in output_file.text.splitlines():
+                if line.strip():
+                    record = _loads(line)
+                    records[record["custom_id"]] = record
+
+        except Exception as e:
+            self._log("❌ Error running Batch API job: %s", e)
+            self.flush_trace()
+            return [{
+                "answer": f"Error occurred: {e}",
+                "reasoning_steps": [],
+                "tool_calls": [],
+                "error": str(e)
+            } for _ in queries]
+
+        results = []
+        for i in range(len(queries)):
+            record = records.get(f"q{i}", {})
+            response_data = record.get("response") or {}
+            if response_data.get("status_code") != 200:
+                error = str(record.get("error") or response_data.get("body") or "No result returned")
+                results.append({
+                    "answer": f"Error occurred: {error}",
+                    "reasoning_steps": [],
+                    "tool_calls": [],
+                    "error": error
+                })
+                continue
+
+            # One bad record must not cost the rest of a batch that may have taken hours
+            try:
+                response = Response.model_validate(response_data["body"])
+                processed = self.process_output(response.output)
+            except Exception as e:
+                self._log("❌ Error processing batch result q%d: %s", i, e)
+                results.append({
+                    "answer": f"Error occurred: {e}",
+                    "reasoning_steps": [],
+                    "tool_calls": [],
+                    "error": str(e)
+                })
+                continue
+            results.append({
+                "answer": processed["reasoning"],
+                "reasoning_steps": processed["reasoning_steps"],
+                "tool_calls": processed["tool_calls"],
+                "num_steps": len(processed["reasoning_steps"])
+            })
+        return results
+
     def print_execution_trace(self):
         """Pretty print the complete Chain of Thought reasoning trace"""
-        print(f"\n{'='*70}")
-        print("COMPLETE CHAIN OF THOUGHT REASONING TRACE")
-        print(f"{'='*70}\n")
+        if not self.verbose:
+            # Nothing would be buffered; skip walking and re-serializing every step
+            return
+
+        self._log("\n%s\nCOMPLETE CHAIN OF THOUGHT REASONING TRACE\n%s\n", _BANNER, _BANNER)
 
         if not self.reasoning_steps:
-            print("No reasoning steps available")
+            self._log("No reasoning steps available")
+            self.flush_trace()
             return
 
-        print(f"🧠 Total Reasoning Steps: {len(self.reasoning_steps)}\n")
+        self._log("🧠 Total Reasoning Steps: %d\n", len(self.reasoning_steps))
 
         for i, step in enumerate(self.reasoning_steps, 1):
             if step["type"] == "tool_call":
-                print(f"Step {step['step']}: Tool Call - {step['tool']}")
-                print(f"  Arguments: {json.dumps(step['arguments'], indent=2)}")
-                print(f"  Result: {step['result']}\n")
+                self._log("Step %s: Tool Call - %s", step["step"], step["tool"])
+                self._log("  Arguments: %s", orjson.dumps(step["arguments"], option=orjson.OPT_INDENT_2).decode())
+                self._log("  Result: %s\n", step["result"])
             elif step["type"] == "reasoning":
-                print(f"Reasoning Output:")
-                print(f"  {step['content']}\n")
+                self._log("Reasoning Output:")
+                self._log("  %s\n", step["content"])
+
+        if self.state.timings:
+            self._log("⏱️  Time by phase:")
+            for label, (calls, total_ms, slowest_ms) in self.state.timings.items():
+                self._log("  %s: %d calls, %.1f ms total, %.1f ms slowest", label, calls, total_ms, slowest_ms)
+
+        self.flush_trace()
 
     def reset(self):
         """Reset conversation state"""
-        self.memory = []
-        self.reasoning_steps = []
-        self.conversation_history = []
-        self.response_id = None
+        self.state.reset()
 
 
-# Example usage
-def main():
-    print("\n" + "="*70)
-    print("CHAIN OF THOUGHT AGENT WITH RESPONSES API")
-    print("="*70)
+class AgentPool:
+    """
+    Free list of ready-to-use agents. acquire() hands out a recycled agent when one is
+    available and release() resets it and keeps it for the next caller, so handling many
+    short conversations doesn't allocate a new agent and state for each one.
+    """
 
-    # Example 1: Multi-step reasoning with calculations
-    print("\n" + "="*70)
-    print("EXAMPLE 1: Multi-step mathematical problem with Chain of Thought")
-    print("="*70)
+    def __init__(self, factory: Callable[[], ChainOfThoughtAgent], max_size: int = 32):
+        self.factory = factory
+        self.max_size = max_size
+        self._free: "queue.SimpleQueue[ChainOfThoughtAgent]" = queue.SimpleQueue()
 
-    agent = ChainOfThoughtAgent(model="gpt-4o")
+    def acquire(self) -> ChainOfThoughtAgent:
+        try:
+            return self._free.get_nowait()
+        except queue.Empty:
+            return self.factory()
 
-    result = agent.run(
-        "If I have 15 apples and I buy 3 more bags with 8 apples each, "
-        "then give away half of my apples, how many do I have left?",
-        store_conversation=True
-    )
+    def release(self, agent: ChainOfThoughtAgent):
+        agent.reset()
+        if self._free.qsize() < self.max_size:
+            self._free.put(agent)
+
+
+# Example usage
+def print_result(title: str, agent: Optional[ChainOfThoughtAgent], result: Dict[str, Any]):
+    """Print the final result and reasoning trace for one example"""
+    print("\n" + "="*70)
+    print(title)
+    print("="*70)
 
     print(f"\n{'='*70}")
     print("📊 FINAL RESULT")
@@ -328,53 +1233,97 @@ def main():
     print(f"Number of Reasoning Steps: {result.get('num_steps', 'N/A')}")
     print(f"Tool Calls Made: {len(result.get('tool_calls', []))}")
 
-    agent.print_execution_trace()
-
-    # Example 2: Information gathering with multiple tools
-    print("\n" + "="*70)
-    print("EXAMPLE 2: Multi-tool information gathering with Chain of Thought")
-    print("="*70)
+    if agent is not None:
+        agent.print_execution_trace()
 
-    agent2 = ChainOfThoughtAgent(model="gpt-4o")
 
-    result2 = agent2.run(
+EXAMPLES = [
+    # Example 1: Multi-step reasoning with calculations
+    (
+        "EXAMPLE 1: Multi-step mathematical problem with Chain of Thought",
+        "If I have 15 apples and I buy 3 more bags with 8 apples each, "
+        "then give away half of my apples, how many do I have left?",
+    ),
+    # Example 2: Information gathering with multiple tools
+    (
+        "EXAMPLE 2: Multi-tool information gathering with Chain of Thought",
         "What is Python programming language? What's today's date? "
         "Then tell me: was Python created more than 30 years ago from today?",
-        store_conversation=True
-    )
-
-    print(f"\n{'='*70}")
-    print("📊 FINAL RESULT")
-    print(f"{'='*70}")
-    print(f"Answer: {result2['answer']}")
-    print(f"Number of Reasoning Steps: {result2.get('num_steps', 'N/A')}")
-    print(f"Tool Calls Made: {len(result2.get('tool_calls', []))}")
+    ),
+    # Example 3: Complex problem requiring step-by-step reasoning
+    (
+        "EXAMPLE 3: Complex problem with Chain of Thought reasoning",
+        "A store has a sale where everything is 20% off. If I buy a laptop for $800, "
+        "a mouse for $25, and headphones for $75, what's my total after the discount? "
+        "Also, if I pay with a $1000 bill, how much change do I get?",
+    ),
+]
 
-    agent2.print_execution_trace()
 
-    # Example 3: Complex problem requiring step-by-step reasoning
+async def main_async(single_request: bool = False, batch: bool = False):
     print("\n" + "="*70)
-    print("EXAMPLE 3: Complex problem with Chain of Thought reasoning")
+    print("CHAIN OF THOUGHT AGENT WITH RESPONSES API")
     print("="*70)
 
-    agent3 = ChainOfThoughtAgent(model="gpt-4o")
-
-    result3 = agent3.run(
-        "A store has a sale where everything is 20% off. If I buy a laptop for $800, "
-        "a mouse for $25, and headphones for $75, what's my total after the discount? "
-        "Also, if I pay with a $1000 bill, how much change do I get?",
-        store_conversation=True
-    )
+    pool = AgentPool(lambda: ChainOfThoughtAgent(model="gpt-4o"))
+    await warm_up_connection()
+
+    if batch:
+        # Demo runs have no latency requirement, so trade turnaround time for cost
+        agent = pool.acquire()
+        results = await agent.run_with_batch_api([query for _, query in EXAMPLES])
+        pool.release(agent)
+        agents = [None] * len(EXAMPLES)
+    elif single_request:
+        # Marshal every example into one request (no tools available in this mode)
+        agent = pool.acquire()
+        results = await agent.run_batch([query for _, query in EXAMPLES])
+        pool.release(agent)
+        agents = [None] * len(EXAMPLES)  # batched results carry no per-agent trace
+    else:
+        # The examples are independent, so run them concurrently: total wall time
+        # is bounded by the slowest query instead of the sum of all of them.
+        agents = [pool.acquire() for _ in EXAMPLES]
+        results = await asyncio.gather(*(
+            agent.run(query, store_conversation=True)
+            for agent, (_, query) in zip(agents, EXAMPLES)
+        ))
+
+    for agent, (title, _), result in zip(agents, EXAMPLES, results):
+        print_result(title, agent, result)
+        if agent is not None:
+            pool.release(agent)
+
+
+async def _run_and_close(**options):
+    try:
+        await main_async(**options)
+    finally:
+        # Release the pooled connections (closes the shared httpx client too)
+        await client.close()
+        if aio_transport is not None:
+            await aio_transport.close()
+        if _trace_file is not None:
+            _trace_file.close()
+        if isinstance(response_cache, SQLiteCache):
+            response_cache.close()
 
-    print(f"\n{'='*70}")
-    print("📊 FINAL RESULT")
-    print(f"{'='*70}")
-    print(f"Answer: {result3['answer']}")
-    print(f"Number of Reasoning Steps: {result3.get('num_steps', 'N/A')}")
-    print(f"Tool Calls Made: {len(result3.get('tool_calls', []))}")
 
-    # Show reasoning trace
-    agent3.print_execution_trace()
+def main():
+    parser = argparse.ArgumentParser(description="Chain of Thought agent examples")
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument(
+        "--single-request",
+        action="store_true",
+        help="answer all examples with one marshaled API call instead of one call each",
+    )
+    mode.add_argument(
+        "--batch",
+        action="store_true",
+        help="submit the examples through the Batch API (cheaper, results may take hours)",
+    )
+    args = parser.parse_args()
+    asyncio.run(_run_and_close(single_request=args.single_request, batch=args.batch))
 
 
 if __name__ == "__main__":
@@ -0,0 +1,193 @@
+"""
+Response caching for the Chain of Thought agent
+"""
+import hashlib
+import sqlite3
+import time
+from collections import OrderedDict
+from typing import Any, Callable, List, Optional, Protocol, Sequence
+
+import numpy as np
+import orjson
+
+
+class CacheBackend(Protocol):
+    """Minimal interface a response cache store has to provide"""
+
+    def get(self, key: str) -> Optional[Any]:
+        ...
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        ...
+
+
+class MemoryCache:
+    """In-process LRU cache with a per-entry TTL"""
+
+    def __init__(self, max_size: int = 1024, default_ttl: float = 3600.0):
+        self.max_size = max_size
+        self.default_ttl = default_ttl
+        self._entries: "OrderedDict[str, tuple[float, Any]]" = OrderedDict()
+
+    def get(self, key: str) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            return None
+
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None):
+        expires_at = time.monotonic() + (self.default_ttl if ttl is None else ttl)
+        self._entries[key] = (expires_at, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class SQLiteCache:
+    """
+    Persistent cache in a SQLite file, so cached responses survive process restarts.
+    Values are stored as the bytes produced by encode and rebuilt with decode.
+    Writes are committed at most once per commit_interval (and on flush/close) rather
+    than on every set, since each commit syncs to disk on the calling (event loop)
+    thread; expired rows are deleted every purge_interval.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        encode: Callable[[Any], bytes],
+        decode: Callable[[bytes], Any],
+        default_ttl: float = 86400.0,
+        commit_interval: float = 1.0,
+        purge_interval: float = 300.0
+    ):
+        self.path = path
+        self.encode = encode
+        self.decode = decode
+        self.default_ttl = default_ttl
+        self.commit_interval = commit_interval
+        self.purge_interval = purge_interval
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, expires_at REAL NOT NULL, value BLOB NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS responses_expires_at ON responses (expires_at)")
+        self._purge_expired()
+        self._db.commit()
+        self._last_commit = time.monotonic()
+
+    def _purge_expired(self):
+        self._db.execute("DELETE FROM responses WHERE expires_at < ?", (time.time(),))
+        self._last_purge = time.monotonic()
+
+    def _maybe_commit(self):
+        now = time.monotonic()
+        if now - self._last_commit >= self.commit_interval:
+            if now - self._last_purge >= self.purge_interval:
+                self._purge_expired()
+            self.flush()
+
+    def get(self, key: str) -> Optional[Any]:
+        row = self._db.execute("SELECT expires_at, value FROM responses WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+
+        expires_at, value = row
+        # Wall-clock time, unlike MemoryCache: entries have to stay valid across restarts
+        if expires_at < time.time():
+            self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+            self._maybe_commit()
+            return None
+        return self.decode(value)
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None):
+        expires_at = time.time() + (self.default_ttl if ttl is None else ttl)
+        self._db.execute(
+            "INSERT OR REPLACE INTO responses (key, expires_at, value) VALUES (?, ?, ?)",
+            (key, expires_at, self.encode(value))
+        )
+        self._maybe_commit()
+
+    def flush(self):
+        """Commit pending writes"""
+        self._db.commit()
+        self._last_commit = time.monotonic()
+
+    def clear(self):
+        self._db.execute("DELETE FROM responses")
+        self.flush()
+
+    def close(self):
+        self.flush()
+        self._db.close()
+
+    def __len__(self) -> int:
+        return self._db.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+
+def make_cache_key(**parts: Any) -> str:
+    """Stable SHA-256 key over the request fields that determine the response"""
+    payload = orjson.dumps(parts, option=orjson.OPT_SORT_KEYS, default=str)
+    return hashlib.sha256(payload).hexdigest()
+
+
+class SemanticCache:
+    """
+    Nearest-neighbour cache keyed on query embeddings.
+    A lookup returns the stored value of the most similar previous query when its
+    cosine similarity clears the threshold, so paraphrased queries share one answer.
+    """
+
+    def __init__(self, threshold: float = 0.92, max_size: int = 512):
+        self.threshold = threshold
+        self.max_size = max_size
+        self._values: List[Any] = []
+        self._matrix: Optional[np.ndarray] = None  # (n, dim), rows L2-normalised
+
+    @staticmethod
+    def _normalize(embedding: Sequence[float]) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def lookup(self, embedding: Sequence[float]) -> Optional[Any]:
+        if self._matrix is None:
+            return None
+
+        similarities = self._matrix @ self._normalize(embedding)
+        best = int(similarities.argmax())
+        if similarities[best] >= self.threshold:
+            return self._values[best]
+        return None
+
+    def add(self, embedding: Sequence[float], value: Any):
+        row = self._normalize(embedding)[np.newaxis, :]
+        self._matrix = row if self._matrix is None else np.vstack([self._matrix, row])
+        self._values.append(value)
+
+        # Evict oldest entries first
+        overflow = len(self._values) - self.max_size
+        if overflow > 0:
+            self._matrix = self._matrix[overflow:]
+            del self._values[:overflow]
+
+    def clear(self):
+        self._values = []
+        self._matrix = None
+
+    def __len__(self) -> int:
+        return len(self._values)
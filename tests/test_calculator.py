@@ -0,0 +1,36 @@
+"""
+Calculator tool tests
+"""
+import json
+import os
+import sys
+import unittest
+
+# Add parent directory to path to import the agent
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+os.environ.setdefault("OPENAI_API_KEY", "test")
+
+from main import _calculate
+
+
+class CalculatorTest(unittest.TestCase):
+
+    def test_basic_arithmetic(self):
+        self.assertEqual(json.loads(_calculate("25 * 47"))["result"], 1175)
+
+    def test_result_wider_than_64_bits(self):
+        # orjson can't encode these; the result must still come back exact
+        # (decoded with json, which unlike orjson keeps big integers exact)
+        payload = json.loads(_calculate("2**100"))
+        self.assertTrue(payload["success"])
+        self.assertEqual(payload["result"], 2**100)
+        self.assertEqual(json.loads(_calculate("-(3**60)"))["result"], -(3**60))
+
+    def test_nested_powers_are_rejected_quickly(self):
+        payload = json.loads(_calculate("((9**999)**999)**999"))
+        self.assertFalse(payload["success"])
+        self.assertEqual(json.loads(_calculate("9**999"))["result"], 9**999)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,176 @@
+"""
+Response cache tests
+"""
+import os
+import sqlite3
+import sys
+import tempfile
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+# Add parent directory to path to import the caches
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from response_cache import MemoryCache, SemanticCache, SQLiteCache, make_cache_key
+
+
+class FakeClock:
+    """Stands in for the time module so tests can move both clocks by hand"""
+
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def monotonic(self) -> float:
+        return self.now
+
+    def time(self) -> float:
+        return self.now
+
+    def advance(self, seconds: float):
+        self.now += seconds
+
+
+class ClockTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = FakeClock()
+        patcher = mock.patch("response_cache.time", self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+
+class MemoryCacheTest(ClockTestCase):
+
+    def test_entries_expire_after_their_ttl(self):
+        cache = MemoryCache(default_ttl=10)
+        cache.set("a", 1)
+        cache.set("b", 2, ttl=100)
+        self.clock.advance(11)
+        self.assertIsNone(cache.get("a"))
+        self.assertEqual(cache.get("b"), 2)
+        self.assertEqual(len(cache), 1)
+
+    def test_least_recently_used_entry_is_evicted(self):
+        cache = MemoryCache(max_size=2)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("a"), 1)
+        self.assertEqual(cache.get("c"), 3)
+
+
+class SQLiteCacheTest(ClockTestCase):
+
+    def setUp(self):
+        super().setUp()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, "cache.sqlite")
+
+    def open_cache(self, **kwargs) -> SQLiteCache:
+        return SQLiteCache(self.path, encode=str.encode, decode=bytes.decode, **kwargs)
+
+    def committed_keys(self) -> set:
+        # A second connection only sees what the cache has committed
+        db = sqlite3.connect(self.path)
+        try:
+            return {row[0] for row in db.execute("SELECT key FROM responses")}
+        finally:
+            db.close()
+
+    def test_values_round_trip_until_they_expire(self):
+        cache = self.open_cache(default_ttl=10)
+        cache.set("a", "value")
+        self.assertEqual(cache.get("a"), "value")
+        self.clock.advance(11)
+        self.assertIsNone(cache.get("a"))
+        self.assertEqual(len(cache), 0)
+        cache.close()
+
+    def test_commits_are_batched_per_interval(self):
+        cache = self.open_cache(commit_interval=1.0)
+        cache.set("a", "1")
+        self.assertEqual(self.committed_keys(), set())
+        self.clock.advance(1.0)
+        cache.set("b", "2")
+        self.assertEqual(self.committed_keys(), {"a", "b"})
+        cache.close()
+
+    def test_flush_and_close_commit_pending_writes(self):
+        cache = self.open_cache()
+        cache.set("a", "1")
+        cache.flush()
+        self.assertEqual(self.committed_keys(), {"a"})
+        cache.set("b", "2")
+        cache.close()
+        self.assertEqual(self.committed_keys(), {"a", "b"})
+
+    def test_expired_rows_are_purged(self):
+        cache = self.open_cache(commit_interval=1.0, purge_interval=60.0)
+        cache.set("old", "1", ttl=5)
+        cache.set("new", "2", ttl=1000)
+        self.clock.advance(60)
+        cache.set("newer", "3")
+        self.assertEqual(self.committed_keys(), {"new", "newer"})
+        cache.close()
+
+    def test_expired_rows_are_purged_on_open(self):
+        cache = self.open_cache()
+        cache.set("old", "1", ttl=5)
+        cache.close()
+        self.clock.advance(10)
+        cache = self.open_cache()
+        self.assertEqual(len(cache), 0)
+        cache.close()
+
+
+class SemanticCacheTest(unittest.TestCase):
+
+    def test_lookup_respects_the_threshold(self):
+        cache = SemanticCache(threshold=0.9)
+        self.assertIsNone(cache.lookup([1.0, 0.0]))
+        cache.add([1.0, 0.0], "x-axis")
+        # Scale doesn't matter, only direction
+        self.assertEqual(cache.lookup([3.0, 0.1]), "x-axis")
+        self.assertIsNone(cache.lookup([1.0, 1.0]))
+
+    def test_lookup_returns_the_closest_entry(self):
+        cache = SemanticCache(threshold=0.5)
+        cache.add([1.0, 0.0], "x-axis")
+        cache.add([0.0, 1.0], "y-axis")
+        self.assertEqual(cache.lookup([0.2, 1.0]), "y-axis")
+
+    def test_oldest_entries_are_evicted(self):
+        cache = SemanticCache(threshold=0.99, max_size=2)
+        cache.add([1.0, 0.0, 0.0], "a")
+        cache.add([0.0, 1.0, 0.0], "b")
+        cache.add([0.0, 0.0, 1.0], "c")
+        self.assertEqual(len(cache), 2)
+        self.assertIsNone(cache.lookup([1.0, 0.0, 0.0]))
+        self.assertEqual(cache.lookup([0.0, 1.0, 0.0]), "b")
+        self.assertEqual(cache.lookup([0.0, 0.0, 1.0]), "c")
+
+
+class MakeCacheKeyTest(unittest.TestCase):
+
+    def test_key_ignores_argument_order(self):
+        self.assertEqual(
+            make_cache_key(model="m", input="q", tools=[{"name": "t"}]),
+            make_cache_key(tools=[{"name": "t"}], input="q", model="m")
+        )
+
+    def test_key_depends_on_every_field(self):
+        base = make_cache_key(model="m", input="q")
+        self.assertNotEqual(base, make_cache_key(model="m", input="q2"))
+        self.assertNotEqual(base, make_cache_key(model="m", input="q", previous_response_id="r1"))
+
+    def test_unserializable_values_fall_back_to_str(self):
+        value = SimpleNamespace(a=1)
+        self.assertEqual(make_cache_key(x=value), make_cache_key(x=str(value)))
+
+
+if __name__ == "__main__":
+    unittest.main()
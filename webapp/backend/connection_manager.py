@@ -2,37 +2,60 @@
 WebSocket Connection Manager
 """
 import logging
-from typing import Dict, Optional
+import os
+from typing import Dict, Optional, Tuple
 from fastapi import WebSocket
 
 from enhanced_agent import EnhancedAgent
+from main import AgentPool
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
+# Disconnected agents kept for reuse by the next clients
+AGENT_POOL_SIZE = int(os.getenv("AGENT_POOL_SIZE", "32"))
+
 
 class ConnectionManager:
     """Manage WebSocket connections and their associated agents"""
 
     def __init__(self):
-        self.active_connections: Dict[str, WebSocket] = {}
-        self.agents: Dict[str, EnhancedAgent] = {}
+        # One entry per client, so connect/disconnect touch a single dict
+        self._clients: Dict[str, Tuple[WebSocket, EnhancedAgent]] = {}
+        # Connection churn reuses agents instead of constructing one per connect
+        self._agent_pool = AgentPool(EnhancedAgent, max_size=AGENT_POOL_SIZE)
 
-    async def connect(self, websocket: WebSocket, client_id: str):
-        """Accept a new WebSocket connection and create an agent for it"""
+    async def connect(self, websocket: WebSocket, client_id: str) -> EnhancedAgent:
+        """Accept a new WebSocket connection and return the agent assigned to it"""
         await websocket.accept()
-        self.active_connections[client_id] = websocket
-        self.agents[client_id] = EnhancedAgent(websocket=websocket)
+        agent = self._agent_pool.acquire()
+        agent.attach(websocket)
+        displaced = self._clients.get(client_id)
+        self._clients[client_id] = (websocket, agent)
+        if displaced is not None:
+            # Same id reconnected before the old socket closed. Its endpoint still holds
+            # the old agent, so detach it but don't pool it for another client
+            displaced[1].detach()
+            logger.info(f"Client {client_id} replaced an existing connection")
         logger.info(f"Client {client_id} connected")
-
-    def disconnect(self, client_id: str):
-        """Remove a client connection and its agent"""
-        if client_id in self.active_connections:
-            del self.active_connections[client_id]
-        if client_id in self.agents:
-            del self.agents[client_id]
+        return agent
+
+    def disconnect(self, client_id: str, websocket: WebSocket):
+        """Remove a client connection and return its agent to the pool"""
+        entry = self._clients.get(client_id)
+        # A socket displaced by a reconnect with the same id must not remove the live one
+        if entry is not None and entry[0] is websocket:
+            del self._clients[client_id]
+            agent = entry[1]
+            agent.detach()
+            self._agent_pool.release(agent)
         logger.info(f"Client {client_id} disconnected")
 
     def get_agent(self, client_id: str) -> Optional[EnhancedAgent]:
         """Get the agent associated with a client ID"""
-        return self.agents.get(client_id)
+        entry = self._clients.get(client_id)
+        return entry[1] if entry is not None else None
+
+    def __len__(self) -> int:
+        """Number of connected clients"""
+        return len(self._clients)
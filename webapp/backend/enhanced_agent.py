@@ -1,25 +1,42 @@
 """
 Enhanced Agent with UI tool support and WebSocket streaming
 """
-import json
 import asyncio
 import logging
-from typing import Dict, List, Optional
-from datetime import datetime
+import threading
+from typing import Dict, List, Optional, Set, Tuple
 from fastapi import WebSocket
-from openai import OpenAI
+from openai.types.responses import Response
+import orjson
 import os
 import sys
+from time import time_ns
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
+# Outbound frames buffered per client before send_message applies backpressure
+OUTBOX_SIZE = 1024
+# Most frames the writer coalesces into one "batch" frame
+MAX_FRAMES_PER_SEND = 64
+
+# Sent when a query didn't use any tool
+_NO_TOOLS_PAYLOAD = {
+    "message": "I couldn't find any tools that match your request. I can help you with:",
+    "available_capabilities": (
+        "Calculations (e.g., 'What is 25 * 47?')",
+        "Knowledge search (e.g., 'Tell me about Python')",
+        "Current date/time (e.g., 'What's today's date?')",
+        "UI customization (e.g., 'Change theme to purple', 'Enable high contrast')"
+    )
+}
+
 # Add parent directory to path to import the agent
 parent_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), "../.."))
 sys.path.insert(0, parent_dir)
 
 try:
-    from main import ChainOfThoughtAgent
+    from main import ChainOfThoughtAgent, client as openai_client
 except ImportError as e:
     logger.error(f"Error importing ChainOfThoughtAgent: {e}")
     raise
@@ -30,50 +47,136 @@ class EnhancedAgent(ChainOfThoughtAgent):
 
     def __init__(self, websocket: Optional[WebSocket] = None, model: str = "gpt-4o"):
         super().__init__(model)
-        self.websocket = websocket
-        self.client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+        self.websocket: Optional[WebSocket] = None
+        self._outbox: Optional[asyncio.Queue] = None  # Frames waiting for the writer task
+        self._writer: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None  # Loop serving the client
+        self._loop_thread: Optional[int] = None  # Thread running that loop
+        self._queries: Set[asyncio.Task] = set()  # Queries submitted by the client
+        self._query_lock = asyncio.Lock()  # Runs one client's queries one at a time
+        # The process-wide client from main.py: one HTTP/2 connection pool and TLS
+        # context for every agent instead of one per WebSocket connection
+        self.client = openai_client
         self.ui_tools: List[Dict] = []  # UI tools registered by client
+        self._ui_tool_names: Set[str] = set()  # Membership index over ui_tools
+        self._tools_config: Optional[List[Dict]] = None  # Backend + UI tools, rebuilt on register
         self.ui_tool_results: Dict[str, asyncio.Future] = {}  # Pending UI tool executions
         self.ui_state = {
             "theme_color": "#3b82f6",  # Default blue
             "high_contrast": False
         }
+        if websocket is not None:
+            self.attach(websocket)
+
+    def attach(self, websocket: WebSocket):
+        """Bind a (possibly recycled) agent to a newly connected client"""
+        self.websocket = websocket
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread = threading.get_ident()
+        self._outbox = asyncio.Queue(maxsize=OUTBOX_SIZE)
+        self._writer = asyncio.create_task(self._write_frames(websocket, self._outbox))
+
+    async def cancel_queries(self):
+        """Cancel the client's in-flight queries and wait for them to unwind"""
+        tasks = list(self._queries)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def reset(self):
+        """Reset conversation state, cancelling any query still writing to it"""
+        for task in self._queries:
+            task.cancel()
+        self._queries.clear()
+        super().reset()
+
+    def detach(self):
+        """Drop everything tied to the current client before the agent is pooled"""
+        for task in self._queries:
+            task.cancel()
+        self._queries.clear()
+        if self._writer is not None:
+            self._writer.cancel()
+        self._writer = None
+        self._outbox = None
+        self._loop = None
+        self._loop_thread = None
+        self.websocket = None
+        self.ui_tools = []
+        self._ui_tool_names = set()
+        self._tools_config = None
+        for future in self.ui_tool_results.values():
+            future.cancel()
+        self.ui_tool_results.clear()
+        self.ui_state = {
+            "theme_color": "#3b82f6",
+            "high_contrast": False
+        }
 
     def register_ui_tools(self, tools: List[Dict]):
         """Register UI tools sent from the frontend"""
         self.ui_tools = tools
+        self._ui_tool_names = {t['name'] for t in tools}
+        self._tools_config = None
         logger.info(f"Registered {len(tools)} UI tools: {[t['name'] for t in tools]}")
 
     async def send_message(self, message_type: str, data: Dict):
         """Send real-time updates via WebSocket"""
-        if self.websocket:
+        await self.send_frame({
+            "type": message_type,
+            "data": data,
+            # Epoch milliseconds: no datetime/isoformat per message, and the
+            # client can pass it straight to new Date()
+            "timestamp": time_ns() // 1_000_000
+        })
+
+    async def send_frame(self, frame: Dict):
+        """
+        Queue a frame for the client's writer task. Everything sent to a client goes
+        through here, so frames keep their order and only one task writes to the socket.
+        """
+        if self._outbox is not None:
+            await self._outbox.put(frame)
+
+    @staticmethod
+    async def _write_frames(websocket: WebSocket, outbox: asyncio.Queue):
+        """
+        Writer task: send queued frames, merging whatever has piled up since the last
+        send into one "batch" frame so a burst of updates costs a single socket write
+        """
+        while True:
+            frames = [await outbox.get()]
+            while len(frames) < MAX_FRAMES_PER_SEND and not outbox.empty():
+                frames.append(outbox.get_nowait())
+            if len(frames) == 1:
+                message = frames[0]
+            else:
+                message = {"type": "batch", "data": frames, "timestamp": time_ns() // 1_000_000}
             try:
-                await self.websocket.send_json({
-                    "type": message_type,
-                    "data": data,
-                    "timestamp": datetime.now().isoformat()
-                })
+                # Starlette's send_json encodes with the stdlib json module; orjson is
+                # several times faster. Still a text frame, as the browser expects
+                await websocket.send_text(orjson.dumps(message).decode())
             except Exception as e:
                 logger.error(f"Error sending WebSocket message: {e}")
 
     def get_tools_config(self) -> List[Dict]:
         """Extended tools including dynamically registered UI tools"""
-        backend_tools = super().get_tools_config()
-
-        # Include UI tools registered by the client
-        return backend_tools + self.ui_tools
+        # Include UI tools registered by the client; the combined list only changes
+        # when the client registers tools, so build it once rather than per query
+        if self._tools_config is None:
+            self._tools_config = super().get_tools_config() + self.ui_tools
+        return self._tools_config
 
     async def execute_tool_async(self, tool_name: str, arguments: Dict) -> str:
         """Execute both backend and UI tools (async version)"""
 
         # Check if this is a UI tool
-        ui_tool_names = [tool['name'] for tool in self.ui_tools]
-        if tool_name in ui_tool_names:
+        if tool_name in self._ui_tool_names:
             # This is a UI tool - request execution from client
-            logger.info(f"Requesting UI tool execution: {tool_name}")
+            logger.info("Requesting UI tool execution: %s", tool_name)
 
             # Create a future to wait for the result
-            result_future = asyncio.Future()
+            result_future = asyncio.get_running_loop().create_future()
             self.ui_tool_results[tool_name] = result_future
 
             # Send execution request to client
@@ -84,10 +187,13 @@ class EnhancedAgent(ChainOfThoughtAgent):
 
             # Wait for result from client (with timeout)
             try:
-                result = await asyncio.wait_for(result_future, timeout=10.0)
+                # timeout() cancels this task in place; wait_for would wrap the future
+                # in an extra task
+                async with asyncio.timeout(10.0):
+                    result = await result_future
                 return result
-            except asyncio.TimeoutError:
-                return json.dumps({"error": f"UI tool '{tool_name}' execution timed out"})
+            except TimeoutError:
+                return orjson.dumps({"error": f"UI tool '{tool_name}' execution timed out"}).decode()
             finally:
                 # Clean up
                 if tool_name in self.ui_tool_results:
@@ -99,24 +205,26 @@ class EnhancedAgent(ChainOfThoughtAgent):
 
     def execute_tool(self, tool_name: str, arguments: Dict) -> str:
         """Execute both backend and UI tools (sync version for compatibility)"""
-        logger.info(f"execute_tool called: {tool_name} with args: {arguments}")
-        # This method is called by the parent class synchronously
-        # For UI tools, we need to use the async version
-        # Check if this is a UI tool
-        ui_tool_names = [tool['name'] for tool in self.ui_tools]
-        if tool_name in ui_tool_names:
-            logger.info(f"{tool_name} is a UI tool, executing async")
-            # Run async version in event loop
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
-            try:
-                return loop.run_until_complete(self.execute_tool_async(tool_name, arguments))
-            finally:
-                loop.close()
+        # Logging on the per-call path is %-style so arguments and results are only
+        # formatted when the record is emitted; payload dumps are DEBUG
+        logger.debug("execute_tool called: %s with args: %s", tool_name, arguments)
+        # The parent class calls this synchronously from its tool worker threads.
+        # A UI tool has to round-trip through the client's WebSocket, so hand it to
+        # the event loop serving that client and wait for the result here
+        if tool_name in self._ui_tool_names:
+            logger.debug("%s is a UI tool, executing async", tool_name)
+            if self._loop is None:
+                return orjson.dumps({"error": f"UI tool '{tool_name}' has no connected client"}).decode()
+            if self._loop.is_running() and self._loop_thread == threading.get_ident():
+                # Blocking here would stop the loop that has to deliver the result
+                # (e.g. process_output called from a coroutine); use execute_tool_async
+                return orjson.dumps({"error": f"UI tool '{tool_name}' cannot run synchronously on the event loop"}).decode()
+            future = asyncio.run_coroutine_threadsafe(self.execute_tool_async(tool_name, arguments), self._loop)
+            return future.result()
         else:
-            logger.info(f"{tool_name} is a backend tool, calling parent execute_tool")
+            logger.debug("%s is a backend tool, calling parent execute_tool", tool_name)
             result = super().execute_tool(tool_name, arguments)
-            logger.info(f"Backend tool {tool_name} returned: {result[:100]}...")
+            logger.debug("Backend tool %s returned: %.100s...", tool_name, result)
             return result
 
     def set_ui_tool_result(self, tool_name: str, result: str):
@@ -126,6 +234,44 @@ class EnhancedAgent(ChainOfThoughtAgent):
             if not future.done():
                 future.set_result(result)
 
+    def submit_query(self, query: str):
+        """
+        Process a query in a background task, so the caller can keep reading the
+        client's messages (a query waiting on a UI tool needs its result delivered)
+        """
+        task = asyncio.create_task(self._run_query(query))
+        self._queries.add(task)
+        task.add_done_callback(self._queries.discard)
+
+    async def _run_query(self, query: str):
+        async with self._query_lock:
+            await self.process_with_chain_of_thought_streaming(query)
+
+    async def stream_response(self, stage: str, **request) -> Tuple[Response, List[str]]:
+        """
+        Make one API call as a stream, forwarding text to the client token by token
+        ("reasoning_delta") and once more per finished text part ("reasoning").
+        Returns the final response and the finished text parts.
+        """
+        texts = []
+        async with self.client.responses.stream(**request) as stream:
+            async for event in stream:
+                if event.type == "response.output_text.delta":
+                    await self.send_message("reasoning_delta", {"text": event.delta, "stage": stage})
+                elif event.type == "response.output_text.done":
+                    texts.append(event.text)
+                    self.reasoning_steps.append({
+                        "type": "reasoning",
+                        "text": event.text
+                    })
+                    await self.send_message("reasoning", {
+                        "text": event.text,
+                        "stage": stage,
+                        "streamed": True
+                    })
+            response = await stream.get_final_response()
+        return response, texts
+
     async def process_with_chain_of_thought_streaming(self, query: str) -> Dict:
         """Process query with real-time WebSocket updates"""
 
@@ -144,8 +290,9 @@ class EnhancedAgent(ChainOfThoughtAgent):
 
             await self.send_message("status", {"message": "Calling OpenAI API...", "stage": "api_call"})
 
-            # Call OpenAI API
-            response = self.client.responses.create(
+            # Call OpenAI API; text reaches the client while it is generated
+            response, texts = await self.stream_response(
+                "thinking",
                 model=self.model,
                 input=query,
                 instructions=system_instructions,
@@ -153,7 +300,7 @@ class EnhancedAgent(ChainOfThoughtAgent):
             )
 
             self.response_id = response.id
-            reasoning_text = ""
+            reasoning_text = "".join(text + "\n" for text in texts)
             tool_calls_made = []
 
             await self.send_message("status", {"message": "Processing response...", "stage": "processing"})
@@ -163,17 +310,17 @@ class EnhancedAgent(ChainOfThoughtAgent):
 
             # Process response outputs
             for item in response.output:
-                logger.info(f"Processing output item: {item.type}")
+                logger.debug("Processing output item: %s", item.type)
                 if item.type == "function_call":
                     tool_name = item.name
-                    call_id = item.id  # Get the call ID for submitting the result
-                    logger.info(f"Function call detected: {tool_name} (call_id: {call_id})")
+                    call_id = item.call_id  # Get the call ID for submitting the result
+                    logger.info("Function call detected: %s (call_id: %s)", tool_name, call_id)
                     try:
-                        arguments = json.loads(item.arguments)
-                    except json.JSONDecodeError:
+                        arguments = orjson.loads(item.arguments)
+                    except orjson.JSONDecodeError:
                         arguments = {"raw": item.arguments}
 
-                    logger.info(f"Parsed arguments: {arguments}")
+                    logger.debug("Parsed arguments: %s", arguments)
 
                     await self.send_message("tool_call", {
                         "tool": tool_name,
@@ -182,23 +329,24 @@ class EnhancedAgent(ChainOfThoughtAgent):
                     })
 
                     # Execute tool (use async version for UI tools)
-                    ui_tool_names = [tool['name'] for tool in self.ui_tools]
-                    if tool_name in ui_tool_names:
-                        logger.info(f"Executing UI tool: {tool_name}")
+                    if tool_name in self._ui_tool_names:
+                        logger.debug("Executing UI tool: %s", tool_name)
                         result = await self.execute_tool_async(tool_name, arguments)
                     else:
-                        logger.info(f"Executing backend tool: {tool_name}")
+                        logger.debug("Executing backend tool: %s", tool_name)
                         result = self.execute_tool(tool_name, arguments)
 
-                    logger.info(f"Tool execution result: {result[:200]}...")
+                    logger.debug("Tool execution result: %.200s...", result)
 
-                    # Check if it's a UI action
-                    try:
-                        result_json = json.loads(result)
-                        if result_json.get("type") == "ui_action":
+                    # Check if it's a UI action. Only results mentioning one are parsed;
+                    # every other tool result skips the decode (and the failure path)
+                    if '"ui_action"' in result:
+                        try:
+                            result_json = orjson.loads(result)
+                        except orjson.JSONDecodeError:
+                            result_json = None
+                        if isinstance(result_json, dict) and result_json.get("type") == "ui_action":
                             await self.send_message("ui_action", result_json)
-                    except:
-                        pass
 
                     tool_call_info = {
                         "tool": tool_name,
@@ -220,67 +368,29 @@ class EnhancedAgent(ChainOfThoughtAgent):
 
                     # Collect function output to submit back to OpenAI
                     function_outputs.append({
+                        "type": "function_call_output",
                         "call_id": call_id,
                         "output": result
                     })
 
-                elif item.type == "message":
-                    if hasattr(item, 'content'):
-                        for content_item in item.content:
-                            if hasattr(content_item, 'text'):
-                                text = content_item.text
-                                reasoning_text += text + "\n"
-
-                                self.reasoning_steps.append({
-                                    "type": "reasoning",
-                                    "text": text
-                                })
-
-                                await self.send_message("reasoning", {
-                                    "text": text,
-                                    "stage": "thinking"
-                                })
-
             # If we have function outputs, we need to make a follow-up call with the results
             if function_outputs:
                 logger.info(f"Making follow-up call with {len(function_outputs)} function results")
                 await self.send_message("status", {"message": "Processing function results...", "stage": "continuing"})
 
-                # Build a follow-up message with the function results
-                follow_up_prompt = f"I called the tools and got these results:\n"
-                for tc in tool_calls_made:
-                    follow_up_prompt += f"\nTool: {tc['tool']}\nResult: {tc['result']}\n"
-                follow_up_prompt += f"\nBased on these results, please provide a complete answer to: {query}"
-
-                logger.info(f"Follow-up prompt: {follow_up_prompt[:200]}...")
-
-                # Make another API call with the function results
-                follow_up_response = self.client.responses.create(
+                # Continue the stored response with the tool outputs linked by call_id;
+                # the model already has the query and its own calls server-side.
+                # Instructions are not carried over by previous_response_id
+                follow_up_response, texts = await self.stream_response(
+                    "final_answer",
                     model=self.model,
-                    input=follow_up_prompt,
+                    previous_response_id=response.id,
+                    input=function_outputs,
                     instructions=system_instructions,
                     tools=tools
                 )
-
-                # Process the follow-up response
-                for item in follow_up_response.output:
-                    logger.info(f"Processing follow-up output item: {item.type}")
-                    if item.type == "message":
-                        if hasattr(item, 'content'):
-                            for content_item in item.content:
-                                if hasattr(content_item, 'text'):
-                                    text = content_item.text
-                                    reasoning_text += text + "\n"
-
-                                    self.reasoning_steps.append({
-                                        "type": "reasoning",
-                                        "text": text
-                                    })
-
-                                    await self.send_message("reasoning", {
-                                        "text": text,
-                                        "stage": "final_answer"
-                                    })
+                self.response_id = follow_up_response.id
+                reasoning_text += "".join(text + "\n" for text in texts)
 
             # Add assistant response to history
             self.conversation_history.append({
@@ -292,15 +402,7 @@ class EnhancedAgent(ChainOfThoughtAgent):
             no_tools_used = len(tool_calls_made) == 0
             if no_tools_used:
                 logger.info("No tools were used for this query")
-                await self.send_message("no_tools_used", {
-                    "message": "I couldn't find any tools that match your request. I can help you with:",
-                    "available_capabilities": [
-                        "Calculations (e.g., 'What is 25 * 47?')",
-                        "Knowledge search (e.g., 'Tell me about Python')",
-                        "Current date/time (e.g., 'What's today's date?')",
-                        "UI customization (e.g., 'Change theme to purple', 'Enable high contrast')"
-                    ]
-                })
+                await self.send_message("no_tools_used", _NO_TOOLS_PAYLOAD)
 
             result = {
                 "answer": reasoning_text.strip(),
@@ -1,15 +1,15 @@
 """
 WebSocket-enabled FastAPI server for LLM Agent with UI and Backend Tools
 """
-import json
 import asyncio
 import logging
 from typing import Dict, List, Optional, Any
-from datetime import datetime
 from fastapi import FastAPI, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
+import orjson
 import os
 import sys
+from time import time_ns
 
 from enhanced_agent import EnhancedAgent
 from connection_manager import ConnectionManager
@@ -44,6 +44,16 @@ app.add_middleware(
 
 manager = ConnectionManager()
 
+# The static members of the "connected" handshake data, serialized once per server
+# (without the opening brace) so each connection only encodes its client_id
+_CONNECTED_DATA_TAIL = orjson.dumps({
+    "message": "Connected to LLM Agent",
+    "available_tools": {
+        "backend": ["calculator", "search_knowledge", "get_current_date"],
+        "ui": ["change_theme_color", "enable_high_contrast"]
+    }
+})[1:]
+
 
 @app.get("/")
 async def root():
@@ -61,101 +71,116 @@ async def root():
 async def health():
     return {
         "status": "healthy",
-        "active_connections": len(manager.active_connections)
+        "active_connections": len(manager)
     }
 
 
+async def _handle_register_ui_tools(agent: EnhancedAgent, data: Dict[str, Any]):
+    # Client is registering its UI tools
+    agent.register_ui_tools(data.get("tools", []))
+
+
+async def _handle_ui_tool_result(agent: EnhancedAgent, data: Dict[str, Any]):
+    # Client is returning the result of a UI tool execution
+    tool_name = data.get("tool")
+    agent.set_ui_tool_result(tool_name, data.get("result"))
+    logger.info(f"Received UI tool result for {tool_name}")
+
+
+async def _handle_ui_tool_error(agent: EnhancedAgent, data: Dict[str, Any]):
+    # Client had an error executing a UI tool
+    tool_name = data.get("tool")
+    error = data.get("error")
+    agent.set_ui_tool_result(tool_name, orjson.dumps({"error": error}).decode())
+    logger.error(f"UI tool error for {tool_name}: {error}")
+
+
+async def _handle_query(agent: EnhancedAgent, data: Dict[str, Any]):
+    query = data.get("query", "")
+    if query:
+        # Process query with streaming updates, in the background so the loop keeps
+        # receiving the UI tool results the query may be waiting for
+        logger.info(f"Processing query: {query}")
+        agent.submit_query(query)
+
+
+async def _handle_reset(agent: EnhancedAgent, data: Dict[str, Any]):
+    # Let a running query unwind first so it can't write into the cleared state
+    await agent.cancel_queries()
+    agent.reset()
+    await agent.send_frame({
+        "type": "reset_complete",
+        "data": {"message": "Agent reset successfully"},
+        "timestamp": time_ns() // 1_000_000
+    })
+
+
+async def _handle_ping(agent: EnhancedAgent, data: Dict[str, Any]):
+    await agent.send_frame({
+        "type": "pong",
+        "timestamp": time_ns() // 1_000_000
+    })
+
+
+# Client message type -> handler(agent, message)
+_MESSAGE_HANDLERS = {
+    "register_ui_tools": _handle_register_ui_tools,
+    "ui_tool_result": _handle_ui_tool_result,
+    "ui_tool_error": _handle_ui_tool_error,
+    "query": _handle_query,
+    "reset": _handle_reset,
+    "ping": _handle_ping,
+}
+
+
 @app.websocket("/ws/{client_id}")
 async def websocket_endpoint(websocket: WebSocket, client_id: str):
     try:
-        await manager.connect(websocket, client_id)
+        agent = await manager.connect(websocket, client_id)
         logger.info(f"Client {client_id} connected successfully")
 
         # Send initial connection message
-        await websocket.send_json({
+        await agent.send_frame({
             "type": "connected",
-            "data": {
-                "client_id": client_id,
-                "message": "Connected to LLM Agent",
-                "available_tools": {
-                    "backend": ["calculator", "search_knowledge", "get_current_date"],
-                    "ui": ["change_theme_color", "enable_high_contrast"]
-                }
-            },
-            "timestamp": datetime.now().isoformat()
+            # A Fragment is written into the frame as-is by the writer's orjson encode
+            "data": orjson.Fragment(b'{"client_id":' + orjson.dumps(client_id) + b"," + _CONNECTED_DATA_TAIL),
+            "timestamp": time_ns() // 1_000_000
         })
         logger.info(f"Sent connection message to client {client_id}")
 
         while True:
-            # Receive message from client
-            data = await websocket.receive_json()
+            # Receive message from client. The browser sends JSON text frames; orjson
+            # decodes them several times faster than receive_json's stdlib json
+            data = orjson.loads(await websocket.receive_text())
             message_type = data.get("type")
             logger.info(f"Received message from {client_id}: {message_type}")
 
-            if message_type == "register_ui_tools":
-                # Client is registering its UI tools
-                tools = data.get("tools", [])
-                agent = manager.get_agent(client_id)
-                if agent:
-                    agent.register_ui_tools(tools)
-                    logger.info(f"Registered {len(tools)} UI tools for client {client_id}")
-
-            elif message_type == "ui_tool_result":
-                # Client is returning the result of a UI tool execution
-                tool_name = data.get("tool")
-                result = data.get("result")
-                agent = manager.get_agent(client_id)
-                if agent:
-                    agent.set_ui_tool_result(tool_name, result)
-                    logger.info(f"Received UI tool result for {tool_name}")
-
-            elif message_type == "ui_tool_error":
-                # Client had an error executing a UI tool
-                tool_name = data.get("tool")
-                error = data.get("error")
-                agent = manager.get_agent(client_id)
-                if agent:
-                    error_result = json.dumps({"error": error})
-                    agent.set_ui_tool_result(tool_name, error_result)
-                    logger.error(f"UI tool error for {tool_name}: {error}")
-
-            elif message_type == "query":
-                query = data.get("query", "")
-                agent = manager.get_agent(client_id)
-
-                if agent and query:
-                    # Process query with streaming updates
-                    logger.info(f"Processing query: {query}")
-                    await agent.process_with_chain_of_thought_streaming(query)
-
-            elif message_type == "reset":
-                agent = manager.get_agent(client_id)
-                if agent:
-                    agent.reset()
-                    await websocket.send_json({
-                        "type": "reset_complete",
-                        "data": {"message": "Agent reset successfully"},
-                        "timestamp": datetime.now().isoformat()
-                    })
-
-            elif message_type == "ping":
-                await websocket.send_json({
-                    "type": "pong",
-                    "timestamp": datetime.now().isoformat()
-                })
+            handler = _MESSAGE_HANDLERS.get(message_type)
+            if handler is not None:
+                await handler(agent, data)
 
     except WebSocketDisconnect:
         logger.info(f"Client {client_id} disconnected normally")
-        manager.disconnect(client_id)
+        manager.disconnect(client_id, websocket)
     except Exception as e:
         logger.error(f"WebSocket error for client {client_id}: {type(e).__name__}: {e}")
         import traceback
         traceback.print_exc()
-        manager.disconnect(client_id)
+        manager.disconnect(client_id, websocket)
 
 
 if __name__ == "__main__":
     import uvicorn
     logger.info("Starting LLM Agent WebSocket Server...")
     logger.info("WebSocket endpoint: ws://localhost:8000/ws/{client_id}")
-    uvicorn.run(app, host="0.0.0.0", port=8000, log_level="info")
+    # loop/http stay on "auto": uvicorn picks uvloop and httptools when uvicorn[standard]
+    # installed them, and falls back to asyncio/h11 where they're unavailable (Windows)
+    uvicorn.run(
+        app,
+        host="0.0.0.0",
+        port=8000,
+        ws="websockets",
+        # Frames here are small JSON messages; compressing them costs more CPU than it saves
+        ws_per_message_deflate=False,
+        log_level="info"
+    )
@@ -80,6 +80,11 @@ export function useWebSocket(clientId: string, onUIAction: (action: string, payl
     const { type, data } = wsMessage;
 
     switch (type) {
+      case 'batch':
+        // Several messages the server coalesced into one frame, in order
+        (data as WebSocketMessage[]).forEach(handleWebSocketMessage);
+        break;
+
       case 'connected':
         console.log('Connected to agent:', data);
         setMessages([{
@@ -94,6 +99,21 @@ export function useWebSocket(clientId: string, onUIAction: (action: string, payl
         setAgentStatus(data);
         break;
 
+      case 'reasoning_delta':
+        // Text streamed while the model is still generating it
+        if (currentMessageRef.current) {
+          currentMessageRef.current.content += data.text;
+          setMessages(prev => {
+            const updated = [...prev];
+            const lastIndex = updated.length - 1;
+            if (lastIndex >= 0 && updated[lastIndex].id === currentMessageRef.current?.id) {
+              updated[lastIndex] = { ...currentMessageRef.current! };
+            }
+            return updated;
+          });
+        }
+        break;
+
       case 'reasoning':
         const reasoningStep: ReasoningStep = {
           type: 'reasoning',
@@ -102,9 +122,9 @@ export function useWebSocket(clientId: string, onUIAction: (action: string, payl
         };
         setCurrentReasoningSteps(prev => [...prev, reasoningStep]);
 
-        // Update current message content
+        // Update current message content (streamed text already arrived as deltas)
         if (currentMessageRef.current) {
-          currentMessageRef.current.content += data.text + '\n';
+          currentMessageRef.current.content += data.streamed ? '\n' : data.text + '\n';
           setMessages(prev => {
             const updated = [...prev];
             const lastIndex = updated.length - 1;
@@ -24,7 +24,7 @@ export interface ReasoningStep {
 export interface WebSocketMessage {
   type: string;
   data: any;
-  timestamp: string;
+  timestamp: number;  // epoch milliseconds
 }
 
 export interface UIState {